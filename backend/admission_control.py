@@ -0,0 +1,146 @@
+"""
+Admission Control for Upstream AI Services
+Caps how many requests may be talking to Gemini or Google TTS at once, bounds how many may wait
+for a slot, and rate limits each user, so a burst of AI traffic is rejected early with a
+Retry-After instead of tying up every worker thread the CRUD endpoints also need.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+
+class UpstreamSaturated(Exception):
+    """Raised when an upstream has no free slot and its wait queue is full or the wait timed out."""
+
+    def __init__(self, upstream: str, retry_after: int):
+        super().__init__(f"{upstream} is busy, please retry in {retry_after}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class RateLimited(Exception):
+    """Raised when a user has exhausted their request budget."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many requests, please retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class UpstreamLimiter:
+    """
+    A concurrency limit with a bounded, deadline-aware wait queue for one upstream service.
+
+    Sync FastAPI endpoints run on a shared thread pool, so every waiter holds a thread.
+    Keep max_concurrent + max_queue across all limiters well below the pool size (40 by default).
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._rejected_full = 0
+        self._rejected_timeout = 0
+
+    @contextmanager
+    def slot(self):
+        """Holds one of the upstream's slots for the duration of the block."""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self) -> None:
+        """Takes a slot, waiting up to queue_timeout; raises UpstreamSaturated if none frees up."""
+        with self._condition:
+            if self._active < self.max_concurrent and self._waiting == 0:
+                self._active += 1
+                self._admitted += 1
+                return
+            if self._waiting >= self.max_queue:
+                self._rejected_full += 1
+                raise UpstreamSaturated(self.name, self._retry_after())
+
+            deadline = time.monotonic() + self.queue_timeout
+            self._waiting += 1
+            try:
+                while self._active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._rejected_timeout += 1
+                        raise UpstreamSaturated(self.name, self._retry_after())
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._active += 1
+            self._admitted += 1
+
+    def release(self) -> None:
+        """Returns a slot taken with acquire()."""
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout))
+
+    def stats(self) -> Dict:
+        """Returns a snapshot of the limiter's occupancy and rejection counters."""
+        with self._condition:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": self._waiting,
+                "admitted": self._admitted,
+                "rejected_queue_full": self._rejected_full,
+                "rejected_timeout": self._rejected_timeout,
+            }
+
+
+class TokenBucketRateLimiter:
+    """Per-key token buckets: each key may make `burst` requests at once, refilled at `rate` per second."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._rejected = 0
+
+    def check(self, key: str) -> None:
+        """Consumes one token for the key, or raises RateLimited if none is left."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+            if tokens < 1.0:
+                self._buckets[key] = (tokens, now)
+                self._rejected += 1
+                raise RateLimited(max(1, math.ceil((1.0 - tokens) / self.rate)))
+            self._buckets[key] = (tokens - 1.0, now)
+
+            # Full buckets carry no state, so drop them once the table grows.
+            if len(self._buckets) > 10000:
+                self._buckets = {
+                    k: (t, u) for k, (t, u) in self._buckets.items()
+                    if t + (now - u) * self.rate < self.burst
+                }
+
+    def stats(self) -> Dict:
+        """Returns the bucket configuration and rejection counter."""
+        with self._lock:
+            return {
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "tracked_users": len(self._buckets),
+                "rejected": self._rejected,
+            }
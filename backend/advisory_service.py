@@ -0,0 +1,115 @@
+"""
+Kerala Crop Advisory Service - Precomputed Monthly Advisories
+Serves the advisories generated offline by generate_advisories.py from memory, for chat and
+the crop calendar, and recognises the "what should I plant this month" questions they answer.
+"""
+
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from supabase import Client
+
+from crop_calendar_service import MONTH_NAMES, normalize_district
+from reference_data import ReferenceDataWatcher
+
+PAGE_SIZE = 1000
+
+AdvisoryKey = Tuple[str, str, int]
+
+# Stage of a crop in the month an advisory is for, as stored in crop_advisories.stage (script 26).
+PLANTING_STAGE = "Planting"
+HARVEST_STAGE = "Harvest"
+CROP_CARE_STAGE = "Crop care"
+
+# "What should I plant this month?" / "Which crops can I sow this month?": a what/which question
+# about planting, plus "this month". Questions about pests, weather or a past planting fall through.
+_PLANTING_QUESTION = re.compile(
+    r"\b(?:what|which)\b.*\b(?:plant|sow|grow|cultivate)\b|\b(?:what|which)\s+crops?\b", re.IGNORECASE
+)
+_THIS_MONTH = re.compile(r"\b(?:this|current)\s+month\b", re.IGNORECASE)
+
+
+def advisory_key(district: str, crop: str, month: int) -> AdvisoryKey:
+    return normalize_district(district), crop.strip().lower(), int(month)
+
+
+def load_advisories(supabase_client: Client) -> Dict[AdvisoryKey, Dict]:
+    """Reads every stored advisory, keyed by (district, crop, month)."""
+    advisories: Dict[AdvisoryKey, Dict] = {}
+    start = 0
+    while True:
+        response = supabase_client.table("crop_advisories").select(
+            "district_name, crop_name, month, stage, advisory"
+        ).order("advisory_id").range(start, start + PAGE_SIZE - 1).execute()
+        page = response.data or []
+        for row in page:
+            advisories[advisory_key(row["district_name"], row["crop_name"], row["month"])] = row
+        if len(page) < PAGE_SIZE:
+            return advisories
+        start += PAGE_SIZE
+
+
+def is_monthly_question(message: str) -> bool:
+    """Returns True for questions the monthly advisories can answer on their own."""
+    # Advisories are generated in English only, so other languages are left to the model.
+    if any(ch.isalpha() and not ch.isascii() for ch in message):
+        return False
+    return bool(_PLANTING_QUESTION.search(message) and _THIS_MONTH.search(message))
+
+
+class AdvisoryService:
+    def __init__(self, supabase_client: Client, watcher: Optional[ReferenceDataWatcher] = None):
+        """Initialize the advisory service; advisories are loaded on the first refresh."""
+        self.supabase = supabase_client
+        self.watcher = watcher or ReferenceDataWatcher(supabase_client)
+        self._by_district_month: Dict[Tuple[str, int], List[Dict]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Reloads all advisories from the database."""
+        versions = self.watcher.begin_build()
+        try:
+            advisories = load_advisories(self.supabase)
+        except Exception as e:
+            # Table missing (migration 23 not applied) or unreachable: serve without advisories.
+            print(f"Warning: Could not load crop advisories. Error: {e}")
+            advisories = {}
+
+        by_district_month: Dict[Tuple[str, int], List[Dict]] = {}
+        for (district, _, month), row in sorted(advisories.items()):
+            by_district_month.setdefault((district, month), []).append(row)
+        with self._lock:
+            self._by_district_month = by_district_month
+            self._loaded = True
+        self.watcher.mark_built(versions)
+        print(f"Crop advisories: loaded {len(advisories)} advisories ({self.watcher.version_tag}).")
+
+    def by_district_month(self) -> Dict[Tuple[str, int], List[Dict]]:
+        """Returns all advisories grouped by (normalized district, month), reloading them if they changed."""
+        if not self._loaded or self.watcher.has_changed():
+            self.refresh()
+        return self._by_district_month
+
+    def for_district_month(self, district: Optional[str], month: int) -> List[Dict]:
+        """Returns the advisories for every major crop of a district in a month."""
+        if not district:
+            return []
+        return self.by_district_month().get((normalize_district(district), month), [])
+
+    def answer(self, message: str, district: Optional[str], month: int) -> Optional[str]:
+        """
+        Returns a ready-made chat reply for a monthly question, listing the crops planted in the
+        district that month, or None to fall back to the model.
+        """
+        if not district or not is_monthly_question(message):
+            return None
+        advisories = [a for a in self.for_district_month(district, month) if a.get("stage") == PLANTING_STAGE]
+        if not advisories:
+            return None
+        lines = [f"**{MONTH_NAMES[month - 1]} planting advisory for {district}:**", ""]
+        for row in advisories:
+            lines.append(f"**{row['crop_name']}:** {row['advisory']}")
+            lines.append("")
+        return "\n".join(lines).strip()
@@ -0,0 +1,270 @@
+"""
+Kerala Crop Calendar Service - Precomputed Calendar Documents
+Builds the crop calendar for every (month, district) pair from the reference data once,
+keeps the serialized documents in memory and rebuilds them only when the data changes.
+District calendars use the precomputed crop advisories, when available, as prediction descriptions.
+"""
+
+import hashlib
+import json
+import re
+import threading
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from supabase import Client
+
+from reference_data import ReferenceDataWatcher
+from reference_snapshot import SnapshotStore, decode_rows, encode_rows
+
+MONTH_NAMES = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December"
+]
+
+# Spellings used in the reference CSVs that differ from the `districts` master table.
+DISTRICT_ALIASES = {"kasargod": "kasaragod"}
+
+# (season, rainfall period) for each month, following Kerala's agricultural seasons.
+KERALA_SEASONS = {
+    1: ("Winter (Dhanu-Makaram)", "Dry spell - irrigate regularly"),
+    2: ("Winter (Makaram-Kumbham)", "Dry spell - irrigate regularly"),
+    3: ("Summer (Kumbham-Meenam)", "Pre-monsoon showers possible late in the month"),
+    4: ("Summer (Meenam-Medam)", "Pre-monsoon summer showers"),
+    5: ("Summer (Medam-Edavam)", "Summer showers, South-West monsoon onset by month end"),
+    6: ("South-West Monsoon (Edavappathi)", "Heavy South-West monsoon rainfall"),
+    7: ("South-West Monsoon (Karkidakam)", "Heavy South-West monsoon rainfall"),
+    8: ("South-West Monsoon (Chingam)", "Moderate South-West monsoon rainfall"),
+    9: ("South-West Monsoon (Kanni)", "Retreating South-West monsoon"),
+    10: ("North-East Monsoon (Thulavarsham)", "North-East monsoon thunderstorms"),
+    11: ("North-East Monsoon (Vrischikam)", "North-East monsoon thunderstorms"),
+    12: ("Winter (Dhanu)", "Light North-East monsoon showers"),
+}
+
+CATEGORY_ICONS = {"Food Crop": "sprout", "Vegetable": "sprout", "Spice": "droplets", "Plantation": "sun"}
+
+MONTHLY_SCHEDULE = {
+    "weeks": [
+        {"title": "Week 1", "activities": [{"text": "Prepare land", "icon": "sprout"}, {"text": "Sow seeds", "icon": "droplets"}]},
+        {"title": "Week 2", "activities": [{"text": "First watering", "icon": "droplets"}]},
+        {"title": "Week 3", "activities": [{"text": "Pest control", "icon": "bug"}]},
+        {"title": "Week 4", "activities": [{"text": "Harvesting", "icon": "scissors"}]},
+    ]
+}
+
+MAX_PREDICTIONS = 6
+CROPS_TABLE = "comprehensive_agriculture_data"
+STATEWIDE_KEY = "all"
+
+
+def normalize_district(name: Optional[str]) -> str:
+    """Returns a lookup key for a district name that tolerates case and known spelling variants."""
+    if not name:
+        return STATEWIDE_KEY
+    key = re.sub(r"[^a-z]", "", name.lower())
+    return DISTRICT_ALIASES.get(key, key)
+
+
+def planting_months(planting_period: Optional[str]) -> List[int]:
+    """
+    Parses a free-text planting period such as "April-May, September-October" or
+    "Year-round" into month numbers. Hyphenated ranges are expanded (wrapping past December).
+    """
+    if not planting_period:
+        return []
+    text = planting_period.lower()
+    if "year-round" in text or "year round" in text:
+        return list(range(1, 13))
+
+    months = set()
+    for part in text.split(","):
+        found = [i + 1 for i, name in enumerate(MONTH_NAMES) if name.lower() in part]
+        found.sort(key=lambda m: part.index(MONTH_NAMES[m - 1].lower()))
+        if len(found) == 2 and "-" in part:
+            start, end = found
+            month = start
+            while True:
+                months.add(month)
+                if month == end:
+                    break
+                month = month % 12 + 1
+        else:
+            months.update(found)
+    return sorted(months)
+
+
+@dataclass(frozen=True)
+class CalendarEntry:
+    """A serialized calendar document and its validator."""
+    body: bytes
+    etag: str
+
+
+class CropCalendarService:
+    def __init__(
+        self,
+        supabase_client: Client,
+        watcher: Optional[ReferenceDataWatcher] = None,
+        advisory_service=None,
+        snapshots: Optional[SnapshotStore] = None,
+    ):
+        """
+        Initialize the calendar service; documents are built on the first refresh.
+        `advisory_service` is an optional AdvisoryService whose advisories describe district predictions.
+        With `snapshots`, the crop rows are read from the current reference snapshot while it is up to date.
+        """
+        self.supabase = supabase_client
+        self.snapshots = snapshots
+        self.watcher = watcher or ReferenceDataWatcher(supabase_client, snapshots=snapshots)
+        self.advisory_service = advisory_service
+        # Crop rows in the reference snapshot layout; with a snapshot these are the shared mapped pages.
+        self._records, self._strings = encode_rows(CROPS_TABLE, [])
+        self._advisories: Dict[Tuple[str, int], List[Dict]] = {}
+        self._district_names: Dict[str, str] = {}
+        self._entries: Dict[Tuple[int, str], CalendarEntry] = {}
+        self._built_for: Optional[date] = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Reloads the reference rows from the database and rebuilds every document."""
+        versions = self.watcher.begin_build()
+        districts_response = self.supabase.table("districts").select("district_name").execute()
+        mapped = self.snapshots.table(CROPS_TABLE, versions) if self.snapshots else None
+        if mapped is not None:
+            records, strings = mapped
+        else:
+            records, strings = encode_rows(CROPS_TABLE, self.supabase.table(CROPS_TABLE).select(
+                "comprehensive_data_id, district_name, category, crop_name, season, planting_period, "
+                "harvest_period, is_major_district, cultivation_type"
+            ).execute().data or [])
+
+        advisories = {}
+        if self.advisory_service:
+            # Reload unconditionally: the advisory service's own watcher may have checked recently
+            # and would keep serving the advisories from before the change that triggered this rebuild.
+            self.advisory_service.refresh()
+            advisories = self.advisory_service.by_district_month()
+
+        district_names = {normalize_district(d["district_name"]): d["district_name"] for d in districts_response.data or []}
+        with self._lock:
+            self._records, self._strings = records, strings
+            self._district_names = district_names
+            self._advisories = advisories
+            self._rebuild(date.today())
+        self.watcher.mark_built(versions)
+        print(f"Crop calendar: built {len(self._entries)} documents ({self.watcher.version_tag}).")
+
+    def get(self, month: int, district: Optional[str] = None) -> Optional[CalendarEntry]:
+        """
+        Returns the calendar for a month and district, or None if the district is unknown.
+        Passing no district returns the statewide calendar.
+        """
+        if not self._entries or self.watcher.has_changed():
+            self.refresh()
+
+        today = date.today()
+        with self._lock:
+            if self._built_for != today:
+                # The weather guidance is dated, so documents roll over daily from the cached rows.
+                self._rebuild(today)
+            return self._entries.get((month, normalize_district(district)))
+
+    def _rows_by_month(self) -> Dict[int, List[Dict]]:
+        """Decodes the crop rows planted in each month; each distinct planting period is parsed once."""
+        periods = self._records["planting_period"]
+        indexes: Dict[int, List[np.ndarray]] = {m: [] for m in range(1, 13)}
+        for code in np.unique(periods[periods >= 0]).tolist():
+            months = planting_months(str(self._strings[code]))
+            if months:
+                matching = np.flatnonzero(periods == code)
+                for month in months:
+                    indexes[month].append(matching)
+        return {
+            month: decode_rows(CROPS_TABLE, self._records[np.sort(np.concatenate(found))], self._strings) if found else []
+            for month, found in indexes.items()
+        }
+
+    def _rebuild(self, today: date) -> None:
+        rows_by_month = self._rows_by_month()
+
+        weather_guidance = [
+            {
+                "date": (today + timedelta(days=n)).isoformat(),
+                "condition": "Sunny",
+                "impact": "Good for planting",
+                "icon": "sun",
+            }
+            for n in range(1, 4)
+        ]
+
+        entries = {}
+        keys = [(STATEWIDE_KEY, None)] + list(self._district_names.items())
+        for month in range(1, 13):
+            for key, district_name in keys:
+                if district_name is None:
+                    rows = rows_by_month[month]
+                    advisories = {}
+                else:
+                    rows = [r for r in rows_by_month[month] if normalize_district(r.get("district_name")) == key]
+                    advisories = {a["crop_name"]: a["advisory"] for a in self._advisories.get((key, month), [])}
+                document = self._build_document(month, district_name, rows, weather_guidance, advisories)
+                body = json.dumps(document, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+                etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+                entries[(month, key)] = CalendarEntry(body=body, etag=etag)
+
+        self._entries = entries
+        self._built_for = today
+
+    @staticmethod
+    def _build_document(
+        month: int,
+        district: Optional[str],
+        rows: List[Dict],
+        weather_guidance: List[Dict],
+        advisories: Optional[Dict[str, str]] = None,
+    ) -> Dict:
+        season, rainfall_period = KERALA_SEASONS[month]
+        # Crops that are major in the district come first, then alphabetically.
+        ranked = sorted(rows, key=lambda r: (not r.get("is_major_district"), r.get("crop_name") or ""))
+
+        predictions = []
+        seen_crops = set()
+        for row in ranked:
+            crop = row.get("crop_name")
+            if crop in seen_crops:
+                continue
+            seen_crops.add(crop)
+            predictions.append({
+                "id": f"pred_{row.get('comprehensive_data_id', len(predictions))}",
+                "crop": crop,
+                "stage": "Planting",
+                "action": f"Plant {crop}",
+                "timing": row.get("planting_period") or "This month",
+                "priority": "high" if row.get("is_major_district") else "medium",
+                "description": (advisories or {}).get(crop) or (
+                    f"{crop} ({row.get('category')}, {row.get('cultivation_type')} cultivation) is planted "
+                    f"{row.get('planting_period')} and harvested {row.get('harvest_period')}."
+                ),
+                "icon": CATEGORY_ICONS.get(row.get("category"), "sprout"),
+            })
+            if len(predictions) >= MAX_PREDICTIONS:
+                break
+
+        if district:
+            crop_count = len({r.get("crop_name") for r in rows})
+            district_note = f"Calendar for {district} district, based on {crop_count} crops planted in {MONTH_NAMES[month - 1]}."
+        else:
+            district_note = "This is a general calendar for Kerala. Set your farm's district for district-specific advice."
+
+        return {
+            "season": season,
+            "rainfall_period": rainfall_period,
+            "month": MONTH_NAMES[month - 1],
+            "district": district or "All Districts",
+            "predictions": predictions,
+            "weather_guidance": weather_guidance,
+            "monthly_schedule": MONTHLY_SCHEDULE,
+            "district_note": district_note,
+        }
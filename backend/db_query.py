@@ -1,43 +1,195 @@
-
 import datetime
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+from postgrest.types import ReturnMethod
 from supabase import Client
-from typing import Optional
-
-def log_query(
-    supabase_client: Client,
-    user_id: str,
-    username: Optional[str],
-    query: str,
-    database_name: str = "postgres",
-):
+
+# How often the per-template statistics are written to the 'query_stats' table.
+QUERY_STATS_FLUSH_SECONDS = float(os.getenv("QUERY_STATS_FLUSH_SECONDS", "300"))
+# Number of recent durations kept per template for the percentile estimates.
+DURATION_SAMPLE_SIZE = 2048
+# Most templates tracked at once; later new templates are counted together under OVERFLOW_TEMPLATE,
+# so a description that leaks request values cannot grow the statistics without bound.
+MAX_TEMPLATES = int(os.getenv("QUERY_STATS_MAX_TEMPLATES", "500"))
+OVERFLOW_TEMPLATE = "(other templates)"
+
+_UUID = re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b")
+_DICT_KEY = re.compile(r"'(\w+)'(?=\s*:)")
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_KEYWORD_LITERAL = re.compile(r"\b(?:None|True|False|null|true|false)\b")
+_LIST = re.compile(r"([\[(])\s*\?(?:\s*,\s*\?)*\s*([\])])")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
     """
-    Logs a query to the 'query_log' table in the database.
+    Turns a query description into its template by replacing literal values with '?'.
+
+    Dict literals keep their keys, and lists of placeholders collapse to a single one, so
+    "INSERT INTO farms {'owner_id': '…', 'farm_name': 'A'}" and "… IN [1, 2, 3]" map to
+    one template regardless of the values or how many there are.
+    """
+    template = _UUID.sub("?", query)
+    template = _DICT_KEY.sub(r"\1", template)
+    template = _STRING.sub("?", template)
+    template = _NUMBER.sub("?", template)
+    template = _KEYWORD_LITERAL.sub("?", template)
+    template = _LIST.sub(r"\1?\2", template)
+    return _WHITESPACE.sub(" ", template).strip()
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class TemplateStats:
+    """Rolling counters for a single query template."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.durations = deque(maxlen=DURATION_SAMPLE_SIZE)
+
+    def record(self, duration_ms: float, failed: bool) -> None:
+        self.calls += 1
+        if failed:
+            self.errors += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.durations.append(duration_ms)
+
+    def summary(self) -> Dict:
+        durations = sorted(self.durations)
+        p50 = _percentile(durations, 0.50)
+        p95 = _percentile(durations, 0.95)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": round(self.total_ms, 2),
+            "mean_ms": round(self.total_ms / self.calls, 2) if self.calls else None,
+            "p50_ms": round(p50, 2) if p50 is not None else None,
+            "p95_ms": round(p95, 2) if p95 is not None else None,
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+class QueryStatsAggregator:
+    """
+    In-process per-template statistics, similar in spirit to pg_stat_statements.
+
+    Keeps totals since the process started (for the admin endpoint) and a window since the
+    last flush, which is written to 'query_stats' as one row per template.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, TemplateStats] = {}
+        self._window: Dict[str, TemplateStats] = {}
+        self._window_start = datetime.datetime.now(datetime.timezone.utc)
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def record(self, query: str, duration_ms: float, failed: bool = False) -> None:
+        template = normalize_query(query)
+        with self._lock:
+            if template not in self._totals and len(self._totals) >= MAX_TEMPLATES:
+                template = OVERFLOW_TEMPLATE
+            for stats in (self._totals, self._window):
+                if template not in stats:
+                    stats[template] = TemplateStats()
+                stats[template].record(duration_ms, failed)
+
+    def snapshot(self) -> List[Dict]:
+        """Returns the totals per template, most expensive first."""
+        with self._lock:
+            rows = [{"template": template, **stats.summary()} for template, stats in self._totals.items()]
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def flush(self, supabase_client: Client) -> None:
+        """Writes the current window to 'query_stats' and starts a new one."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with self._lock:
+            window, window_start = self._window, self._window_start
+            self._window, self._window_start = {}, now
+        if not window:
+            return
+
+        rows = []
+        for template, stats in window.items():
+            summary = stats.summary()
+            rows.append({
+                "template_id": hashlib.md5(template.encode("utf-8")).hexdigest()[:16],
+                "template": template,
+                "window_start": window_start.isoformat(),
+                "window_end": now.isoformat(),
+                "calls": summary["calls"],
+                "errors": summary["errors"],
+                "total_ms": summary["total_ms"],
+                "p50_ms": summary["p50_ms"],
+                "p95_ms": summary["p95_ms"],
+                "max_ms": summary["max_ms"],
+            })
+        try:
+            # The API may only insert statistics (see database script 21), so don't ask for the rows back.
+            supabase_client.table("query_stats").insert(rows, returning=ReturnMethod.minimal).execute()
+        except Exception as e:
+            # Statistics are best-effort; losing one window must not affect requests.
+            print(f"CRITICAL: Failed to flush query stats. Error: {e}")
+
+    def start_flusher(self, supabase_client: Client, interval: float = QUERY_STATS_FLUSH_SECONDS) -> None:
+        """Starts a daemon thread that flushes the window every `interval` seconds."""
+        if self._flusher is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                self.flush(supabase_client)
+
+        self._stop.clear()
+        self._flusher = threading.Thread(target=run, name="query-stats-flusher", daemon=True)
+        self._flusher.start()
+
+    def stop_flusher(self, supabase_client: Client) -> None:
+        """Stops the flusher thread and writes out the last partial window."""
+        self._stop.set()
+        self._flusher = None
+        self.flush(supabase_client)
+
+
+query_stats = QueryStatsAggregator()
+
+
+def execute_query(query: str, request):
+    """
+    Executes a Supabase request and records its duration and outcome under the query's template.
 
     Args:
-        supabase_client: The Supabase client instance.
-        user_id: The ID of the user executing the query.
-        username: The name of the user.
         query: A string representation of the query being executed.
-        database_name: The name of the database being queried.
+        request: The request builder to execute (anything with an `execute()` method).
+
+    Returns:
+        The response of `request.execute()`. Exceptions are recorded and re-raised.
     """
+    started = time.perf_counter()
+    failed = True
     try:
-        log_entry = {
-            "user_id": user_id,
-            "username": username or "N/A",
-            "query": query,
-            "database_name": database_name,
-            "executed_at": datetime.datetime.now().isoformat(),
-            "duration_ms": None, # Add duration to match schema
-        }
-        
-        # We execute this in the background so it doesn't slow down the main request
-        # Note: Supabase-py doesn't have a native async insert without `await`,
-        # so this will still block, but it's a very fast operation.
-        # For a true non-blocking call, this would need to be sent to a background worker.
-        supabase_client.table("query_log").insert(log_entry).execute()
-
-    except Exception as e:
-        # We print the error but don't re-raise it.
-        # The primary function (e.g., getting farm data) should not fail if logging fails.
-        print(f"CRITICAL: Failed to log query. Error: {e}")
-
+        response = request.execute()
+        failed = False
+        return response
+    finally:
+        try:
+            query_stats.record(query, (time.perf_counter() - started) * 1000, failed)
+        except Exception as e:
+            # The primary function (e.g., getting farm data) should not fail if logging fails.
+            print(f"CRITICAL: Failed to record query stats. Error: {e}")
@@ -0,0 +1,242 @@
+"""
+Kerala Crop Advisory Generator - Offline Batch Job
+Generates an advisory for every (district, major crop, month) from comprehensive_agriculture_data
+and the historical yield statistics, and stores them in crop_advisories (database script 23).
+
+It writes with the service role key (SUPABASE_SERVICE_ROLE_KEY), because the API's anon key may
+only read crop_advisories. Run it on a trusted machine; never put that key in the frontend.
+
+The job is resumable: advisories already stored are skipped, and each one is saved as soon as it
+is generated, so an interrupted or partially failed run can simply be started again. Advisories
+stored before crop_advisories had a stage column (script 26) are regenerated.
+
+Usage:
+    python generate_advisories.py                  # generate missing advisories with Gemini
+    python generate_advisories.py --workers 2      # limit concurrent model calls
+    python generate_advisories.py --force          # regenerate everything
+    python generate_advisories.py --fake-model     # deterministic local model, no Gemini calls
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+from advisory_service import (
+    CROP_CARE_STAGE, HARVEST_STAGE, PLANTING_STAGE, AdvisoryKey, advisory_key, load_advisories,
+)
+from crop_calendar_service import KERALA_SEASONS, MONTH_NAMES, planting_months
+from yield_forecast_service import YieldForecastService
+
+# --- Environment and Client Setup ---
+load_dotenv("../.env")
+load_dotenv()
+
+SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
+SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+
+RETRY_BACKOFF_SECONDS = 2.0
+# Columns combined when a crop has several rows (one per season) in a district.
+MERGED_COLUMNS = ("season", "category", "planting_period", "harvest_period", "cultivation_type")
+
+
+class GeminiAdvisoryModel:
+    """Writes advisories with Gemini."""
+    name = "gemini-1.5-flash"
+
+    def __init__(self):
+        import google.generativeai as genai
+
+        if not GEMINI_API_KEY:
+            raise RuntimeError("GEMINI_API_KEY is missing; use --fake-model to run without Gemini.")
+        genai.configure(api_key=GEMINI_API_KEY)
+        self._model = genai.GenerativeModel(self.name)
+
+    def generate(self, context: Dict) -> str:
+        response = self._model.generate_content(build_prompt(context), request_options={"timeout": GEMINI_TIMEOUT_SECONDS})
+        text = (response.text or "").strip()
+        if not text:
+            raise RuntimeError("empty response")
+        return text
+
+
+class FakeAdvisoryModel:
+    """Deterministic stand-in for Gemini, for local runs and checks without an API key."""
+    name = "fake"
+
+    def generate(self, context: Dict) -> str:
+        forecast = context["forecast"]
+        outlook = (
+            f" Expected productivity next season is about {forecast['productivity_tonnes_per_hectare']} t/ha."
+            if forecast else ""
+        )
+        return (
+            f"{context['stage']} month for {context['crop']} in {context['district']} "
+            f"({context['season']}; {context['rainfall']}).{outlook}"
+        )
+
+
+def crop_stage(row: Dict, month: int) -> str:
+    """Describes what a crop needs in a month from its planting and harvest periods."""
+    if month in planting_months(row.get("planting_period")):
+        return PLANTING_STAGE
+    if month in planting_months(row.get("harvest_period")):
+        return HARVEST_STAGE
+    return CROP_CARE_STAGE
+
+
+def _join_distinct(values: Iterable[Optional[str]]) -> Optional[str]:
+    distinct = list(dict.fromkeys(v for v in values if v))
+    return ", ".join(distinct) or None
+
+
+def merge_crop_rows(rows: List[Dict]) -> List[Dict]:
+    """
+    Combines the rows of a crop grown in several seasons in one district (e.g. Palakkad rice in
+    Virippu, Mundakan and Puncha) into one, because advisories are stored per (district, crop, month).
+    """
+    groups: Dict[Tuple[str, str], List[Dict]] = {}
+    for row in rows:
+        groups.setdefault(advisory_key(row["district_name"], row["crop_name"], 1)[:2], []).append(row)
+    return [
+        dict(group[0], **{column: _join_distinct(r.get(column) for r in group) for column in MERGED_COLUMNS})
+        for group in groups.values()
+    ]
+
+
+def build_context(row: Dict, month: int, forecasts: List[Dict]) -> Dict:
+    season, rainfall = KERALA_SEASONS[month]
+    return {
+        "district": row["district_name"],
+        "crop": row["crop_name"],
+        "month": month,
+        "category": row.get("category"),
+        "crop_seasons": row.get("season"),
+        "cultivation_type": row.get("cultivation_type"),
+        "planting_period": row.get("planting_period"),
+        "harvest_period": row.get("harvest_period"),
+        "stage": crop_stage(row, month),
+        "season": season,
+        "rainfall": rainfall,
+        # The historical data has one series per cropping season; use the best-covered one.
+        "forecast": max(forecasts, key=lambda f: f["years_used"]) if forecasts else None,
+    }
+
+
+def build_prompt(context: Dict) -> str:
+    lines = [
+        "You are Krishi Mitra, an agricultural assistant for farmers in Kerala, India.",
+        f"Write a short advisory (at most 3 sentences) for a {context['crop']} farmer in "
+        f"{context['district']} district for {MONTH_NAMES[context['month'] - 1]}.",
+        f"Season: {context['season']}. Rainfall: {context['rainfall']}.",
+        f"Crop: {context['category']}, {context['cultivation_type']} cultivation, planted "
+        f"{context['planting_period']}, harvested {context['harvest_period']}.",
+        f"This month's stage: {context['stage']}.",
+    ]
+    if context["crop_seasons"]:
+        lines.append(f"Cropping seasons in this district: {context['crop_seasons']}.")
+    forecast = context["forecast"]
+    if forecast:
+        lines.append(
+            f"Historical trend: productivity {forecast['productivity_tonnes_per_hectare']} t/ha expected in "
+            f"{forecast['forecast_year']} (trend {forecast['trend_per_year']} t/ha per year)."
+        )
+    lines.append("Give concrete actions for this month. Plain text, no headings.")
+    return "\n".join(lines)
+
+
+def load_major_crops(supabase: Client) -> List[Dict]:
+    """Returns one row per (district, major crop), with the rows of each cropping season merged."""
+    response = supabase.table("comprehensive_agriculture_data").select(
+        "district_name, crop_name, category, season, planting_period, harvest_period, cultivation_type"
+    ).eq("is_major_district", True).execute()
+    return merge_crop_rows(response.data or [])
+
+
+def pending_contexts(crops: List[Dict], yields: YieldForecastService, existing: Set[AdvisoryKey]) -> List[Dict]:
+    """Returns the contexts of every (crop row, month) whose advisory is not in `existing`."""
+    contexts = []
+    for row in crops:
+        forecasts = yields.forecast(crop=row["crop_name"], district=row["district_name"])
+        for month in range(1, 13):
+            if advisory_key(row["district_name"], row["crop_name"], month) not in existing:
+                contexts.append(build_context(row, month, forecasts))
+    return contexts
+
+
+def generate_one(supabase: Client, model, context: Dict, retries: int) -> Optional[str]:
+    """Generates and stores one advisory, retrying with backoff. Returns an error message on failure."""
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+        try:
+            advisory = model.generate(context)
+            supabase.table("crop_advisories").upsert({
+                "district_name": context["district"],
+                "crop_name": context["crop"],
+                "month": context["month"],
+                "stage": context["stage"],
+                "advisory": advisory,
+                "model": model.name,
+                "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }, on_conflict="district_name,crop_name,month").execute()
+            return None
+        except Exception as e:
+            error = str(e)
+    return error
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate crop advisories for every district, major crop and month.")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent model calls (default: 4)")
+    parser.add_argument("--retries", type=int, default=2, help="retries per advisory (default: 2)")
+    parser.add_argument("--force", action="store_true", help="regenerate advisories that already exist")
+    parser.add_argument("--fake-model", action="store_true", help="use the deterministic local model instead of Gemini")
+    args = parser.parse_args()
+
+    if not all([SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY]):
+        raise RuntimeError("VITE_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set.")
+    supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    model = FakeAdvisoryModel() if args.fake_model else GeminiAdvisoryModel()
+
+    print("Loading reference data...")
+    crops = load_major_crops(supabase)
+    yields = YieldForecastService(supabase)
+    yields.refresh()
+    existing = set() if args.force else {key for key, row in load_advisories(supabase).items() if row.get("stage")}
+
+    contexts = pending_contexts(crops, yields, existing)
+    total = len(crops) * 12
+    print(f"{total - len(contexts)} of {total} advisories already stored; generating {len(contexts)} with {model.name}.")
+
+    failures = []
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {pool.submit(generate_one, supabase, model, c, args.retries): c for c in contexts}
+        for future in as_completed(futures):
+            context = futures[future]
+            error = future.result()
+            done += 1
+            if error:
+                failures.append(context)
+                print(f"  ❌ {context['district']} / {context['crop']} / {MONTH_NAMES[context['month'] - 1]}: {error}")
+            elif done % 100 == 0 or done == len(contexts):
+                print(f"  ✔ {done}/{len(contexts)}")
+
+    if failures:
+        print(f"❌ {len(failures)} advisories failed; run the script again to retry them.")
+        return 1
+    print("✅ All advisories are stored.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,32 @@
 # V2.2 - Integrated SQL-based Data Service and Dashboard Endpoint
-from fastapi import FastAPI, Depends, Header, HTTPException, Request
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from supabase import create_client, Client
 from pydantic import BaseModel
 from typing import List, Optional
-from datetime import date, datetime
+from datetime import date, datetime, timedelta, timezone
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 import os
+import uuid
 from dotenv import load_dotenv
 import google.generativeai as genai
 import requests
 from google.cloud import texttospeech
 from agriculture_data_service import KeralaAgricultureDataService
-from db_query import log_query
+from advisory_service import AdvisoryService, is_monthly_question
+from crop_calendar_service import CropCalendarService
+from yield_forecast_service import YieldForecastService
+from reference_snapshot import SnapshotStore
+from weather_service import district_centroid, fetch_batch_forecast
+from tts_chunking import chunk_text
+from admission_control import RateLimited, TokenBucketRateLimiter, UpstreamLimiter, UpstreamSaturated
+from db_query import execute_query, query_stats
+from response_utils import FastJSONResponse, build_select
+from write_behind import WriteBehindQueue
 
 # --- Environment and Client Setup ---
 load_dotenv("../.env")
@@ -20,13 +35,21 @@ load_dotenv()
 SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
 SUPABASE_KEY = os.getenv("VITE_SUPABASE_ANON_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+ADMIN_USER_IDS = {uid.strip() for uid in os.getenv("ADMIN_USER_IDS", "").split(",") if uid.strip()}
+
+# Upstream timeouts and admission limits (see admission_control.py for how they interact).
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+TTS_TIMEOUT_SECONDS = float(os.getenv("TTS_TIMEOUT_SECONDS", "15"))
+TTS_POOL_WORKERS = int(os.getenv("TTS_POOL_WORKERS", "8"))
+TTS_CHUNK_LOOKAHEAD = int(os.getenv("TTS_CHUNK_LOOKAHEAD", "3"))
+CHAT_CONTEXT_WORKERS = int(os.getenv("CHAT_CONTEXT_WORKERS", "8"))
 
 if not all([SUPABASE_URL, SUPABASE_KEY, GEMINI_API_KEY]):
     raise RuntimeError("One or more environment variables are missing.")
 
 genai.configure(api_key=GEMINI_API_KEY)
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -35,9 +58,87 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# --- Admission Control ---
+gemini_limiter = UpstreamLimiter(
+    "gemini",
+    max_concurrent=int(os.getenv("GEMINI_MAX_CONCURRENT", "4")),
+    max_queue=int(os.getenv("GEMINI_MAX_QUEUE", "8")),
+    queue_timeout=float(os.getenv("GEMINI_QUEUE_TIMEOUT_SECONDS", "5")),
+)
+tts_limiter = UpstreamLimiter(
+    "tts",
+    max_concurrent=int(os.getenv("TTS_MAX_CONCURRENT", "4")),
+    max_queue=int(os.getenv("TTS_MAX_QUEUE", "8")),
+    queue_timeout=float(os.getenv("TTS_QUEUE_TIMEOUT_SECONDS", "5")),
+)
+# Chunk synthesis calls from all /tts requests share this pool.
+tts_pool = ThreadPoolExecutor(max_workers=TTS_POOL_WORKERS, thread_name_prefix="tts")
+# Fetches chat context while the request thread spools the user's message and checks the advisories.
+chat_context_pool = ThreadPoolExecutor(max_workers=CHAT_CONTEXT_WORKERS, thread_name_prefix="chat-context")
+# Shared by /chat and /tts: a short burst is fine, sustained use is capped at ~one call per 3s.
+ai_rate_limiter = TokenBucketRateLimiter(
+    rate=float(os.getenv("AI_RATE_LIMIT_PER_SECOND", "0.33")),
+    burst=int(os.getenv("AI_RATE_LIMIT_BURST", "10")),
+)
+
+@app.exception_handler(UpstreamSaturated)
+def upstream_saturated_handler(request: Request, exc: UpstreamSaturated):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
+
+@app.exception_handler(RateLimited)
+def rate_limited_handler(request: Request, exc: RateLimited):
+    return JSONResponse(status_code=429, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
 
 # --- Service Instantiation ---
 agriculture_data_service = KeralaAgricultureDataService(supabase)
+# Memory-mapped reference data shared by all workers on the host (built with reference_snapshot.py).
+reference_snapshots = SnapshotStore()
+advisory_service = AdvisoryService(supabase)
+crop_calendar_service = CropCalendarService(supabase, advisory_service=advisory_service, snapshots=reference_snapshots)
+yield_forecast_service = YieldForecastService(supabase, snapshots=reference_snapshots)
+# Chat messages are written through a local spool so /chat never waits on the inserts.
+chat_write_queue = WriteBehindQueue()
+
+@app.on_event("startup")
+def start_query_stats_flusher():
+    """Periodically writes per-template query statistics to the query_stats table."""
+    query_stats.start_flusher(supabase)
+
+@app.on_event("shutdown")
+def stop_query_stats_flusher():
+    """Flushes the last partial statistics window on shutdown."""
+    query_stats.stop_flusher(supabase)
+
+@app.on_event("startup")
+def start_chat_write_queue():
+    """Replays chat messages spooled before a restart, then keeps sending new ones."""
+    chat_write_queue.start(supabase)
+
+@app.on_event("shutdown")
+def stop_chat_write_queue():
+    """Gives the spool a few seconds to drain; anything left is replayed on the next start."""
+    chat_write_queue.stop()
+
+@app.on_event("startup")
+def build_reference_caches():
+    """Builds the in-memory crop advisories, calendar documents and yield forecasts before serving requests."""
+    # Each cache is rebuilt lazily on the first request if the database is unreachable now.
+    snapshot = reference_snapshots.current()
+    if snapshot is not None:
+        print(f"Reference snapshot: mapped {snapshot.version} from {snapshot.path}.")
+    else:
+        print("Reference snapshot: none built; reading reference tables from the database.")
+    try:
+        # Also loads the advisories, which the calendar embeds.
+        crop_calendar_service.refresh()
+    except Exception as e:
+        print(f"Warning: Could not prebuild crop calendar. Error: {e}")
+    try:
+        yield_forecast_service.refresh()
+    except Exception as e:
+        print(f"Warning: Could not fit yield forecasts. Error: {e}")
 
 # --- V2 Pydantic Models ---
 
@@ -101,6 +202,43 @@ class ActivityLogUpdate(BaseModel):
 class ChatMessage(BaseModel):
     message: str
 
+# --- Field Projections for List Endpoints (?fields=) ---
+FARM_FIELDS = {
+    "farm_id": "farm_id",
+    "farm_name": "farm_name",
+    "owner_id": "owner_id",
+    "district_id": "district_id",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+    "district": "district:districts(district_name)",
+    "farm_plots": "farm_plots(count)",
+}
+PLOT_FIELDS = {
+    "plot_id": "plot_id",
+    "farm_id": "farm_id",
+    "plot_name": "plot_name",
+    "area_acres": "area_acres",
+    "soil_type_id": "soil_type_id",
+    "updated_at": "updated_at",
+    "soil_type": "soil_type:soil_types(soil_name)",
+    "farms": "farms(farm_name)",
+}
+PLANTING_FIELDS = {
+    "planting_id": "planting_id",
+    "plot_id": "plot_id",
+    "crop_id": "crop_id",
+    "planting_date": "planting_date",
+    "expected_yield": "expected_yield",
+    "actual_yield": "actual_yield",
+    "harvest_date": "harvest_date",
+    "updated_at": "updated_at",
+    "crop": "crop:crops(crop_id, crop_name)",
+}
+ACTIVITY_FIELDS = {name: name for name in [
+    "activity_id", "planting_id", "activity_type", "notes", "cost", "status", "scheduled_for",
+    "completed_at", "created_at", "updated_at", "owner_id", "crop_id", "farm_id", "plot_id",
+]}
+
 # --- Auth Helper ---
 def get_current_user(authorization: str = Header(..., alias="Authorization")):
     try:
@@ -112,6 +250,12 @@ def get_current_user(authorization: str = Header(..., alias="Authorization")):
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Authentication failed: {e}")
 
+def require_admin(user=Depends(get_current_user)):
+    """Allows only the users listed in the ADMIN_USER_IDS environment variable."""
+    if user.id not in ADMIN_USER_IDS:
+        raise HTTPException(status_code=403, detail="Admin access required.")
+    return user
+
 # --- API Endpoints ---
 
 @app.get("/")
@@ -123,17 +267,55 @@ def root():
 def get_dashboard_stats(user=Depends(get_current_user)):
     """Returns a variety of statistics for the user's farm using a single, complex SQL function."""
     query_desc = f"RPC: get_user_dashboard_stats for user {user.id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc)
-    response = supabase.rpc("get_user_dashboard_stats", {"p_user_id": user.id}).execute()
+    response = execute_query(query_desc, supabase.rpc("get_user_dashboard_stats", {"p_user_id": user.id}))
     return response.data
 
+def get_user_district_name(user) -> Optional[str]:
+    """Returns the district of the user's first farm, falling back to the district on their profile."""
+    query_desc = f"SELECT district:districts(district_name) FROM farms WHERE owner_id = {user.id} ORDER BY farm_id LIMIT 1"
+    farms_response = execute_query(query_desc, supabase.table("farms").select("district:districts(district_name)").eq("owner_id", user.id).order("farm_id").limit(1))
+    if farms_response.data and farms_response.data[0].get("district"):
+        return farms_response.data[0]["district"]["district_name"]
+
+    query_desc = f"SELECT district:districts(district_name) FROM user_app_profiles WHERE id = {user.id}"
+    profile_response = execute_query(query_desc, supabase.table("user_app_profiles").select("district:districts(district_name)").eq("id", user.id))
+    if profile_response.data and profile_response.data[0].get("district"):
+        return profile_response.data[0]["district"]["district_name"]
+    return None
+
 @app.get("/crop-calendar")
-def get_crop_calendar(month: int, user=Depends(get_current_user)):
-    """Returns the crop calendar data for a given month using a single, complex SQL function."""
-    query_desc = f"RPC: get_crop_calendar for month {month}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc)
-    response = supabase.rpc("get_crop_calendar", {"p_month": month}).execute()
-    return response.data
+def get_crop_calendar(
+    month: int,
+    district: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    user=Depends(get_current_user),
+):
+    """Returns the precomputed crop calendar for a month, for the given district or the user's farm district."""
+    if not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="Month must be between 1 and 12.")
+    if not district:
+        district = get_user_district_name(user)
+
+    entry = crop_calendar_service.get(month, district)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"No crop calendar for district: {district}")
+
+    headers = {"ETag": entry.etag, "Cache-Control": "private, max-age=3600"}
+    if if_none_match == entry.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+@app.get("/yield-forecast")
+def get_yield_forecast(crop: Optional[str] = None, district: Optional[str] = None, season: Optional[str] = None, user=Depends(get_current_user)):
+    """Returns next-season productivity and production forecasts, optionally filtered by crop, district and season."""
+    forecasts = yield_forecast_service.forecast(crop=crop, district=district, season=season)
+    if not forecasts:
+        raise HTTPException(status_code=404, detail="No historical data to forecast for the given filters.")
+    return {
+        "forecast_year": yield_forecast_service.forecast_year,
+        "data_version": yield_forecast_service.watcher.version_tag,
+        "forecasts": forecasts,
+    }
 
 @app.get("/weather")
 def get_weather(lat: Optional[float] = None, lon: Optional[float] = None, language: Optional[str] = "en", user=Depends(get_current_user)):
@@ -176,74 +358,190 @@ def get_weather(lat: Optional[float] = None, lon: Optional[float] = None, langua
         # Catch any other potential errors (e.g., JSON parsing, key errors)
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred while processing weather data: {e}")
 
-@app.post("/tts")
-async def text_to_speech(request: Request, user=Depends(get_current_user)):
-    body = await request.json()
-    text = body.get("text")
-    language = body.get("language", "en")
+@app.get("/weather/farms")
+def get_farms_weather(forecast_days: int = 3, user=Depends(get_current_user)):
+    """Returns current, hourly and daily weather for each of the user's farms using one upstream request."""
+    if not 1 <= forecast_days <= 7:
+        raise HTTPException(status_code=400, detail="forecast_days must be between 1 and 7.")
+
+    query_desc = f"SELECT *, district:districts(district_name) FROM farms WHERE owner_id = {user.id}"
+    farms_response = execute_query(query_desc, supabase.table("farms").select("*, district:districts(district_name)").eq("owner_id", user.id))
+    farms = farms_response.data or []
+
+    # Farms in the same district share a location, so each distinct point is fetched only once.
+    locations = []
+    location_index = {}
+    farm_locations = []
+    for farm in farms:
+        district_name = (farm.get("district") or {}).get("district_name")
+        if farm.get("latitude") is not None and farm.get("longitude") is not None:
+            point, source = (float(farm["latitude"]), float(farm["longitude"])), "farm"
+        else:
+            point, source = district_centroid(district_name), "district"
+        if point is not None and point not in location_index:
+            location_index[point] = len(locations)
+            locations.append(point)
+        farm_locations.append((farm, district_name, point, source))
 
-    if not text:
-        raise HTTPException(status_code=400, detail="Text is required.")
+    try:
+        forecasts = fetch_batch_forecast(locations, forecast_days)
+    except requests.exceptions.RequestException as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching weather data: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred while processing weather data: {e}")
+
+    results = []
+    for farm, district_name, point, source in farm_locations:
+        results.append({
+            "farm_id": farm["farm_id"],
+            "farm_name": farm.get("farm_name"),
+            "district": district_name,
+            "location": {"lat": point[0], "lon": point[1], "source": source} if point else None,
+            "weather": forecasts[location_index[point]] if point else None,
+        })
+    return {"forecast_days": forecast_days, "farms": results}
+
+tts_client = None
+
+def get_tts_client():
+    """Creates the Text-to-Speech client once; it holds a gRPC channel that is reused across requests."""
+    global tts_client
+    if tts_client is None:
+        tts_client = texttospeech.TextToSpeechClient()
+    return tts_client
+
+def synthesize_speech(text: str, language: str) -> bytes:
+    synthesis_input = texttospeech.SynthesisInput(text=text)
+
+    voice_params = {
+        "language_code": f"{language}-IN" if language == "ml" else f"{language}-US",
+        "ssml_gender": texttospeech.SsmlVoiceGender.NEUTRAL,
+    }
+
+    audio_config = texttospeech.AudioConfig(
+        audio_encoding=texttospeech.AudioEncoding.MP3
+    )
+
+    response = get_tts_client().synthesize_speech(
+        input=synthesis_input, voice=voice_params, audio_config=audio_config, timeout=TTS_TIMEOUT_SECONDS
+    )
+    return response.audio_content
 
+def stream_speech(first_audio: bytes, pending: deque, remaining_chunks, language: str):
+    """
+    Yields MP3 audio chunk by chunk, in order, keeping up to TTS_CHUNK_LOOKAHEAD chunks of this
+    request in flight on the shared pool.
+    """
     try:
-        client = texttospeech.TextToSpeechClient()
+        yield first_audio
+        while pending:
+            audio = pending.popleft().result()
+            next_chunk = next(remaining_chunks, None)
+            if next_chunk is not None:
+                pending.append(tts_pool.submit(synthesize_speech, next_chunk, language))
+            yield audio
+    except Exception as e:
+        # Headers are already sent, so the best we can do is end the audio early.
+        print(f"Warning: TTS stream ended early. Error: {e}")
 
-        synthesis_input = texttospeech.SynthesisInput(text=text)
 
-        voice_params = {
-            "language_code": f"{language}-IN" if language == "ml" else f"{language}-US",
-            "ssml_gender": texttospeech.SsmlVoiceGender.NEUTRAL,
-        }
+class SpeechResponse(StreamingResponse):
+    """
+    Streams synthesized speech and frees the request's TTS slot when the response ends, however it
+    ends. Starlette never starts the body of a response whose client has already disconnected, so
+    the slot cannot be released from the generator.
+    """
 
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3
-        )
+    def __init__(self, content, pending: deque, **kwargs):
+        super().__init__(content, **kwargs)
+        self.pending = pending
+        self._released = False
 
-        response = client.synthesize_speech(
-            input=synthesis_input, voice=voice_params, audio_config=audio_config
-        )
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        for future in self.pending:
+            future.cancel()
+        tts_limiter.release()
+
+
+class TTSRequest(BaseModel):
+    text: str
+    language: str = "en"
 
-        return {"audio": response.audio_content, "contentType": "audio/mpeg"}
+@app.post("/tts")
+def text_to_speech(tts_request: TTSRequest, user=Depends(get_current_user)):
+    """Synthesizes the text sentence by sentence and streams the MP3 audio back in order."""
+    chunks = chunk_text(tts_request.text)
+    if not chunks:
+        raise HTTPException(status_code=400, detail="Text is required.")
+
+    ai_rate_limiter.check(user.id)
+    # One slot per request; the pool below bounds how many chunk calls reach the API at once.
+    tts_limiter.acquire()
+    remaining_chunks = iter(chunks)
+    pending = deque()
+    try:
+        pending.extend(
+            tts_pool.submit(synthesize_speech, chunk, tts_request.language)
+            for chunk in islice(remaining_chunks, TTS_CHUNK_LOOKAHEAD)
+        )
+        # Wait for the first chunk before responding, so failures still get a proper status code.
+        first_audio = pending.popleft().result()
+        next_chunk = next(remaining_chunks, None)
+        if next_chunk is not None:
+            pending.append(tts_pool.submit(synthesize_speech, next_chunk, tts_request.language))
     except Exception as e:
+        for future in pending:
+            future.cancel()
+        tts_limiter.release()
         raise HTTPException(status_code=500, detail=f"Error synthesizing speech: {e}")
 
+    return SpeechResponse(
+        stream_speech(first_audio, pending, remaining_chunks, tts_request.language),
+        pending,
+        media_type="audio/mpeg",
+    )
+
 
 # --- Master Data Endpoints ---
 @app.get("/master-data/districts")
 def get_districts(user=Depends(get_current_user)):
     query_desc = "SELECT district_id, district_name FROM districts"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc)
-    response = supabase.table("districts").select("district_id, district_name").execute()
+    response = execute_query(query_desc, supabase.table("districts").select("district_id, district_name"))
     return response.data
 
 @app.get("/master-data/soil-types")
 def get_soil_types(user=Depends(get_current_user)):
     query_desc = "SELECT soil_type_id, soil_name, description FROM soil_types"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc)
-    response = supabase.table("soil_types").select("soil_type_id, soil_name, description").execute()
+    response = execute_query(query_desc, supabase.table("soil_types").select("soil_type_id, soil_name, description"))
     return response.data
 
 @app.get("/master-data/crops")
 def get_crops(user=Depends(get_current_user)):
     query_desc = "SELECT crop_id, crop_name FROM crops"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc)
-    response = supabase.table("crops").select("crop_id, crop_name").execute()
+    response = execute_query(query_desc, supabase.table("crops").select("crop_id, crop_name"))
     return response.data
 
 # --- User Profile Endpoint ---
 @app.get("/profile")
 def get_profile(user=Depends(get_current_user)):
     query_desc = f"SELECT * FROM user_app_profiles WHERE id = {user.id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc)
-    profile_res = supabase.table("user_app_profiles").select("*").eq("id", user.id).execute()
+    profile_res = execute_query(query_desc, supabase.table("user_app_profiles").select("*").eq("id", user.id))
     
     if not profile_res.data:
         user_meta = user.user_metadata or {}
         full_name = user_meta.get("full_name") or user_meta.get("user_name")
         
-        insert_query_desc = f"INSERT INTO user_app_profiles (id, full_name) VALUES ({user.id}, {full_name})"
-        log_query(supabase, user.id, full_name, insert_query_desc)
-        insert_res = supabase.table("user_app_profiles").insert({"id": user.id, "full_name": full_name}).execute()
+        insert_query_desc = f"INSERT INTO user_app_profiles (id, full_name) VALUES ({user.id}, {full_name!r})"
+        insert_res = execute_query(insert_query_desc, supabase.table("user_app_profiles").insert({"id": user.id, "full_name": full_name}))
         
         if not insert_res.data:
             raise HTTPException(status_code=500, detail="Failed to create user profile.")
@@ -263,8 +561,7 @@ def update_profile(profile_data: UserProfileUpdate, user=Depends(get_current_use
         raise HTTPException(status_code=400, detail="No fields provided for update.")
 
     query_desc = f"UPDATE user_app_profiles SET {update_fields} WHERE id = {user.id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc)
-    response = supabase.table("user_app_profiles").update(update_fields).eq("id", user.id).execute()
+    response = execute_query(query_desc, supabase.table("user_app_profiles").update(update_fields).eq("id", user.id))
 
     if response.data:
         return response.data[0]
@@ -272,11 +569,11 @@ def update_profile(profile_data: UserProfileUpdate, user=Depends(get_current_use
 
 # --- Farm, Plot, Planting, Activity Endpoints (CRUD) ---
 @app.get("/farms")
-def get_user_farms(user=Depends(get_current_user)):
-    query_desc = f"SELECT *, district:districts(district_name), farm_plots(count) FROM farms WHERE owner_id = {user.id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc)
-    response = supabase.table("farms").select("*, district:districts(district_name), farm_plots(count)").eq("owner_id", user.id).execute()
-    return response.data
+def get_user_farms(fields: Optional[str] = None, user=Depends(get_current_user)):
+    columns = build_select(fields, FARM_FIELDS, "*, district:districts(district_name), farm_plots(count)")
+    query_desc = f"SELECT {columns} FROM farms WHERE owner_id = {user.id}"
+    response = execute_query(query_desc, supabase.table("farms").select(columns).eq("owner_id", user.id))
+    return FastJSONResponse(response.data)
 
 @app.post("/farms")
 def create_farm(farm_data: FarmCreate, user=Depends(get_current_user)):
@@ -284,8 +581,7 @@ def create_farm(farm_data: FarmCreate, user=Depends(get_current_user)):
     # 1. Create the farm
     farm_insert_data = {"owner_id": user.id, **farm_data.dict()}
     query_desc_1 = f"INSERT INTO farms {farm_insert_data}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_1)
-    farm_response = supabase.table("farms").insert(farm_insert_data).execute()
+    farm_response = execute_query(query_desc_1, supabase.table("farms").insert(farm_insert_data))
 
     if not farm_response.data:
         raise HTTPException(status_code=500, detail="Failed to create farm.")
@@ -295,8 +591,7 @@ def create_farm(farm_data: FarmCreate, user=Depends(get_current_user)):
 
     # 2. Get a default soil type for the plot
     query_desc_2 = "SELECT soil_type_id FROM soil_types LIMIT 1"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_2)
-    soil_types_response = supabase.table("soil_types").select("soil_type_id").limit(1).execute()
+    soil_types_response = execute_query(query_desc_2, supabase.table("soil_types").select("soil_type_id").limit(1))
     if not soil_types_response.data:
         # This indicates a configuration problem (no master data for soil types)
         # We'll log a warning and return the farm, but the plot won't be created.
@@ -314,8 +609,7 @@ def create_farm(farm_data: FarmCreate, user=Depends(get_current_user)):
     }
     
     query_desc_3 = f"INSERT INTO farm_plots {default_plot_data}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_3)
-    plot_response = supabase.table("farm_plots").insert(default_plot_data).execute()
+    plot_response = execute_query(query_desc_3, supabase.table("farm_plots").insert(default_plot_data))
 
     if not plot_response.data:
         # Log a warning if the plot creation fails but the farm was created.
@@ -325,68 +619,63 @@ def create_farm(farm_data: FarmCreate, user=Depends(get_current_user)):
     return new_farm
 
 @app.get("/farms/{farm_id}/plots")
-def get_farm_plots(farm_id: int, user=Depends(get_current_user)):
-    query_desc = f"SELECT *, soil_type:soil_types(soil_name) FROM farm_plots WHERE farm_id = {farm_id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc)
-    response = supabase.table("farm_plots").select("*, soil_type:soil_types(soil_name)").eq("farm_id", farm_id).execute()
-    return response.data
+def get_farm_plots(farm_id: int, fields: Optional[str] = None, user=Depends(get_current_user)):
+    columns = build_select(fields, PLOT_FIELDS, "*, soil_type:soil_types(soil_name)")
+    query_desc = f"SELECT {columns} FROM farm_plots WHERE farm_id = {farm_id}"
+    response = execute_query(query_desc, supabase.table("farm_plots").select(columns).eq("farm_id", farm_id))
+    return FastJSONResponse(response.data)
 
 @app.post("/plots")
 def create_plot(plot_data: FarmPlotCreate, user=Depends(get_current_user)):
     """Creates a new plot for the user."""
     # Security check: Ensure the farm_id belongs to the user.
     query_desc_1 = f"SELECT farm_id FROM farms WHERE owner_id = {user.id} AND farm_id = {plot_data.farm_id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_1)
-    farm_check = supabase.table("farms").select("farm_id").eq("owner_id", user.id).eq("farm_id", plot_data.farm_id).execute()
+    farm_check = execute_query(query_desc_1, supabase.table("farms").select("farm_id").eq("owner_id", user.id).eq("farm_id", plot_data.farm_id))
     if not farm_check.data:
         raise HTTPException(status_code=403, detail="You do not have permission to add a plot to this farm.")
 
     plot_dict = plot_data.dict()
     query_desc_2 = f"INSERT INTO farm_plots {plot_dict}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_2)
-    response = supabase.table("farm_plots").insert(plot_dict).execute()
+    response = execute_query(query_desc_2, supabase.table("farm_plots").insert(plot_dict))
     if not response.data:
         raise HTTPException(status_code=500, detail="Failed to create plot.")
     
     new_plot_id = response.data[0]['plot_id']
     query_desc_3 = f"SELECT *, soil_types(soil_name) FROM farm_plots WHERE plot_id = {new_plot_id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_3)
-    plot_response = supabase.table("farm_plots").select("*, soil_types(soil_name)").eq("plot_id", new_plot_id).single().execute()
+    plot_response = execute_query(query_desc_3, supabase.table("farm_plots").select("*, soil_types(soil_name)").eq("plot_id", new_plot_id).single())
 
     return plot_response.data
 
 @app.get("/plantings")
-def get_user_plantings(user=Depends(get_current_user)):
+def get_user_plantings(fields: Optional[str] = None, user=Depends(get_current_user)):
     """Fetches all plantings owned by the current user across all their farms."""
+    columns = build_select(fields, PLANTING_FIELDS, "*, crop:crops(*)")
     # We need to join through farms and farm_plots to filter by owner_id
     # This is a simplified query; a database view or function could optimize this.
     # For now, we get all farms, then all plots, then all plantings.
     query_desc_1 = f"SELECT farm_id FROM farms WHERE owner_id = {user.id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_1)
-    farms_response = supabase.table("farms").select("farm_id").eq("owner_id", user.id).execute()
+    farms_response = execute_query(query_desc_1, supabase.table("farms").select("farm_id").eq("owner_id", user.id))
     if not farms_response.data:
         return []
     farm_ids = [f['farm_id'] for f in farms_response.data]
 
     query_desc_2 = f"SELECT plot_id FROM farm_plots WHERE farm_id IN {farm_ids}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_2)
-    plots_response = supabase.table("farm_plots").select("plot_id").in_("farm_id", farm_ids).execute()
+    plots_response = execute_query(query_desc_2, supabase.table("farm_plots").select("plot_id").in_("farm_id", farm_ids))
     if not plots_response.data:
         return []
     plot_ids = [p['plot_id'] for p in plots_response.data]
 
-    query_desc_3 = f"SELECT *, crop:crops(*) FROM plantings WHERE plot_id IN {plot_ids}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_3)
-    plantings_response = supabase.table("plantings").select("*, crop:crops(*)").in_("plot_id", plot_ids).execute()
-    return plantings_response.data
+    query_desc_3 = f"SELECT {columns} FROM plantings WHERE plot_id IN {plot_ids}"
+    plantings_response = execute_query(query_desc_3, supabase.table("plantings").select(columns).in_("plot_id", plot_ids))
+    return FastJSONResponse(plantings_response.data)
 
 @app.get("/plots")
-def get_user_plots(user=Depends(get_current_user)):
+def get_user_plots(fields: Optional[str] = None, user=Depends(get_current_user)):
     """Fetches all plots for a user, creating default plots for farms that are missing them."""
+    columns = build_select(fields, PLOT_FIELDS, "*, farms(farm_name)")
     # 1. Get all of the user's farms
     query_desc_1 = f"SELECT farm_id, farm_name FROM farms WHERE owner_id = {user.id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_1)
-    farms_response = supabase.table("farms").select("farm_id, farm_name").eq("owner_id", user.id).execute()
+    farms_response = execute_query(query_desc_1, supabase.table("farms").select("farm_id, farm_name").eq("owner_id", user.id))
     if not farms_response.data:
         return []
     
@@ -395,8 +684,7 @@ def get_user_plots(user=Depends(get_current_user)):
 
     # 2. Get all existing plots for those farms
     query_desc_2 = f"SELECT farm_id FROM farm_plots WHERE farm_id IN {farm_ids}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_2)
-    plots_response = supabase.table("farm_plots").select("farm_id").in_("farm_id", farm_ids).execute()
+    plots_response = execute_query(query_desc_2, supabase.table("farm_plots").select("farm_id").in_("farm_id", farm_ids))
     existing_plot_farm_ids = {p['farm_id'] for p in plots_response.data} if plots_response.data else set()
 
     # 3. Identify farms missing a default plot and create them one-by-one
@@ -404,8 +692,7 @@ def get_user_plots(user=Depends(get_current_user)):
 
     if missing_plot_farms:
         query_desc_3 = "SELECT soil_type_id FROM soil_types LIMIT 1"
-        log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_3)
-        soil_types_response = supabase.table("soil_types").select("soil_type_id").limit(1).execute()
+        soil_types_response = execute_query(query_desc_3, supabase.table("soil_types").select("soil_type_id").limit(1))
         if not soil_types_response.data:
             raise HTTPException(status_code=500, detail="Cannot create default plot: No soil types defined in database.")
         default_soil_id = soil_types_response.data[0]['soil_type_id']
@@ -419,29 +706,25 @@ def get_user_plots(user=Depends(get_current_user)):
             }
             # Insert each plot individually to avoid potential batch-insert issues
             query_desc_4 = f"INSERT INTO farm_plots {plot_to_create}"
-            log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_4)
-            supabase.table("farm_plots").insert(plot_to_create).execute()
+            execute_query(query_desc_4, supabase.table("farm_plots").insert(plot_to_create))
 
     # 4. Return the complete list of plots for the user
-    query_desc_5 = f"SELECT *, farms(farm_name) FROM farm_plots WHERE farm_id IN {farm_ids}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_5)
-    final_plots_response = supabase.table("farm_plots").select("*, farms(farm_name)").in_("farm_id", farm_ids).execute()
-    return final_plots_response.data
+    query_desc_5 = f"SELECT {columns} FROM farm_plots WHERE farm_id IN {farm_ids}"
+    final_plots_response = execute_query(query_desc_5, supabase.table("farm_plots").select(columns).in_("farm_id", farm_ids))
+    return FastJSONResponse(final_plots_response.data)
 
 @app.post("/plantings", response_model=Planting)
 def create_planting(planting_data: PlantingCreate, user=Depends(get_current_user)):
     """Creates a new planting for the user."""
     # Security check: Ensure the plot_id belongs to the user.
     query_desc_1 = f"SELECT plot_id, farm_id FROM farm_plots WHERE plot_id = {planting_data.plot_id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_1)
-    plots_response = supabase.table("farm_plots").select("plot_id, farm_id").eq("plot_id", planting_data.plot_id).execute()
+    plots_response = execute_query(query_desc_1, supabase.table("farm_plots").select("plot_id, farm_id").eq("plot_id", planting_data.plot_id))
     if not plots_response.data:
         raise HTTPException(status_code=404, detail="Plot not found.")
     
     farm_id = plots_response.data[0]['farm_id']
     query_desc_2 = f"SELECT farm_id FROM farms WHERE owner_id = {user.id} AND farm_id = {farm_id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_2)
-    farm_check = supabase.table("farms").select("farm_id").eq("owner_id", user.id).eq("farm_id", farm_id).execute()
+    farm_check = execute_query(query_desc_2, supabase.table("farms").select("farm_id").eq("owner_id", user.id).eq("farm_id", farm_id))
     if not farm_check.data:
         raise HTTPException(status_code=403, detail="You do not have permission to add a planting to this plot.")
 
@@ -452,34 +735,33 @@ def create_planting(planting_data: PlantingCreate, user=Depends(get_current_user
     print(f"--- SERIALIZED PAYLOAD: {planting_dict} ---")
 
     query_desc_3 = f"INSERT INTO plantings {planting_dict}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_3)
-    response = supabase.table("plantings").insert(planting_dict).execute()
+    response = execute_query(query_desc_3, supabase.table("plantings").insert(planting_dict))
     if not response.data:
         raise HTTPException(status_code=500, detail="Failed to create planting.")
     
     new_planting_id = response.data[0]['planting_id']
     # The insert response doesn't include the nested crop, so we fetch it again
     query_desc_4 = f"SELECT *, crop:crops(*) FROM plantings WHERE planting_id = {new_planting_id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_4)
-    new_planting = supabase.table("plantings").select("*, crop:crops(*)").eq("planting_id", new_planting_id).single().execute()
+    new_planting = execute_query(query_desc_4, supabase.table("plantings").select("*, crop:crops(*)").eq("planting_id", new_planting_id).single())
     return new_planting.data
 
 # --- Activity Scheduling Endpoints ---
 
 @app.get("/activities", response_model=List[Activity])
-def get_activities(status: Optional[str] = None, user=Depends(get_current_user)):
+def get_activities(status: Optional[str] = None, fields: Optional[str] = None, user=Depends(get_current_user)):
     """Fetches all activities for the current user, with optional status filtering."""
-    query_desc = f"SELECT * FROM user_activities WHERE owner_id = {user.id}"
+    columns = build_select(fields, ACTIVITY_FIELDS, "*")
+    query_desc = f"SELECT {columns} FROM user_activities WHERE owner_id = {user.id}"
     if status:
-        query_desc += f" AND status = '{status}'"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc)
+        query_desc += f" AND status = {status!r}"
     
-    query = supabase.table("user_activities").select("*").eq("owner_id", user.id)
+    query = supabase.table("user_activities").select(columns).eq("owner_id", user.id)
     if status:
         query = query.eq("status", status)
     
-    response = query.order("scheduled_for", desc=False).execute()
-    return response.data
+    response = execute_query(query_desc, query.order("scheduled_for", desc=False))
+    # Rows come straight from the view, so skip per-row validation; response_model stays for the docs.
+    return FastJSONResponse(response.data)
 
 @app.post("/activities", response_model=Activity)
 def create_activity(activity_data: ActivityCreate, user=Depends(get_current_user)):
@@ -487,40 +769,35 @@ def create_activity(activity_data: ActivityCreate, user=Depends(get_current_user
     # Corrected Security Check:
     # 1. Get the plot_id from the planting_id to start the ownership check.
     query_desc_1 = f"SELECT plot_id FROM plantings WHERE planting_id = {activity_data.planting_id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_1)
-    planting_res = supabase.table("plantings").select("plot_id").eq("planting_id", activity_data.planting_id).execute()
+    planting_res = execute_query(query_desc_1, supabase.table("plantings").select("plot_id").eq("planting_id", activity_data.planting_id))
     if not planting_res.data:
         raise HTTPException(status_code=404, detail="Planting not found.")
 
     # 2. Get the farm_id from the plot_id.
     plot_id = planting_res.data[0]['plot_id']
     query_desc_2 = f"SELECT farm_id FROM farm_plots WHERE plot_id = {plot_id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_2)
-    plot_res = supabase.table("farm_plots").select("farm_id").eq("plot_id", plot_id).execute()
+    plot_res = execute_query(query_desc_2, supabase.table("farm_plots").select("farm_id").eq("plot_id", plot_id))
     if not plot_res.data:
         raise HTTPException(status_code=404, detail="Associated plot not found.")
 
     # 3. Verify the user owns the farm associated with the plot.
     farm_id = plot_res.data[0]['farm_id']
     query_desc_3 = f"SELECT farm_id FROM farms WHERE owner_id = {user.id} AND farm_id = {farm_id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_3)
-    farm_res = supabase.table("farms").select("farm_id").eq("owner_id", user.id).eq("farm_id", farm_id).execute()
+    farm_res = execute_query(query_desc_3, supabase.table("farms").select("farm_id").eq("owner_id", user.id).eq("farm_id", farm_id))
     if not farm_res.data:
         raise HTTPException(status_code=403, detail="You do not have permission to add an activity to this planting.")
 
     # If all checks pass, create the activity.
     activity_dict = activity_data.model_dump(mode='json')
     query_desc_4 = f"INSERT INTO activities_log {activity_dict}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_4)
-    response = supabase.table("activities_log").insert(activity_dict).execute()
+    response = execute_query(query_desc_4, supabase.table("activities_log").insert(activity_dict))
     if not response.data:
         raise HTTPException(status_code=500, detail="Failed to create activity.")
     
     new_activity_id = response.data[0]['activity_id']
     # The insert doesn't return all columns, so we fetch the new activity to match the response model.
     query_desc_5 = f"SELECT * FROM user_activities WHERE activity_id = {new_activity_id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_5)
-    new_activity = supabase.table("user_activities").select("*").eq("activity_id", new_activity_id).single().execute()
+    new_activity = execute_query(query_desc_5, supabase.table("user_activities").select("*").eq("activity_id", new_activity_id).single())
     return new_activity.data
 
 @app.put("/activities/{activity_id}/complete", response_model=Activity)
@@ -528,8 +805,7 @@ def complete_activity(activity_id: int, user=Depends(get_current_user)):
     """Marks an activity as complete."""
     # Security check: Ensure the activity belongs to the user.
     query_desc_1 = f"SELECT activity_id FROM user_activities WHERE owner_id = {user.id} AND activity_id = {activity_id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_1)
-    activity_check = supabase.table("user_activities").select("activity_id").eq("owner_id", user.id).eq("activity_id", activity_id).execute()
+    activity_check = execute_query(query_desc_1, supabase.table("user_activities").select("activity_id").eq("owner_id", user.id).eq("activity_id", activity_id))
     if not activity_check.data:
         raise HTTPException(status_code=404, detail="Activity not found or you do not have permission.")
 
@@ -538,8 +814,7 @@ def complete_activity(activity_id: int, user=Depends(get_current_user)):
         "completed_at": datetime.now().isoformat()
     }
     query_desc_2 = f"UPDATE activities_log SET {update_data} WHERE activity_id = {activity_id}"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_2)
-    response = supabase.table("activities_log").update(update_data).eq("activity_id", activity_id).execute()
+    response = execute_query(query_desc_2, supabase.table("activities_log").update(update_data).eq("activity_id", activity_id))
     if not response.data:
         raise HTTPException(status_code=500, detail="Failed to update activity.")
     return response.data[0]
@@ -551,48 +826,175 @@ def complete_activity(activity_id: int, user=Depends(get_current_user)):
 
 @app.get("/chat/history")
 def get_chat_history(user=Depends(get_current_user)):
-    """Fetches the chat history for the authenticated user."""
-    query_desc = f"SELECT sender, content, created_at FROM chat_messages WHERE user_id = {user.id} ORDER BY created_at"
-    log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc)
-    response = supabase.table("chat_messages").select("sender, content, created_at").eq("user_id", user.id).order("created_at", desc=False).execute()
-    return response.data
+    """Fetches the chat history for the authenticated user, including messages not yet written to the database."""
+    query_desc = f"SELECT sender, content, created_at, client_message_id FROM chat_messages WHERE user_id = {user.id} ORDER BY created_at"
+    response = execute_query(query_desc, supabase.table("chat_messages").select("sender, content, created_at, client_message_id").eq("user_id", user.id).order("created_at", desc=False))
+    history = response.data or []
+    stored_ids = {m.get("client_message_id") for m in history}
+    spooled = [m for m in chat_write_queue.pending("chat_messages", user_id=user.id) if m["client_message_id"] not in stored_ids]
+    if not spooled:
+        return history
+    for message in spooled:
+        history.append({k: message[k] for k in ("sender", "content", "created_at", "client_message_id")})
+    return sorted(history, key=lambda m: m["created_at"] or "")
+
+def spool_chat_message(user_id: str, sender: str, content: str) -> None:
+    """Queues a chat message for a write-behind insert, stamped now so history keeps its order."""
+    chat_write_queue.enqueue("chat_messages", {
+        "client_message_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "sender": sender,
+        "content": content,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }, on_conflict="client_message_id")
+
+def fetch_ai_context(user_id: str, user_query: str) -> str:
+    rpc_params = {"p_user_id": user_id, "p_user_query": user_query}
+    query_desc = f"RPC: get_ai_context with params {rpc_params}"
+    context_response = execute_query(query_desc, supabase.rpc("get_ai_context", rpc_params))
+    return context_response.data if context_response.data else ""
 
 @app.post("/chat")
 def chat_with_ai(message: ChatMessage, user=Depends(get_current_user)):
-    """Receives a user message, gets an AI reply, and saves both to the database."""
+    """
+    Receives a user message, gets an AI reply, and saves both to the database.
+    Only the context fetch and the model call are on the response path: the context is fetched
+    in the background while the user's message is spooled, and both messages are written behind.
+    """
+    ai_rate_limiter.check(user.id)
     try:
-        # 1. Save user's message
-        user_message_data = {"user_id": user.id, "sender": "user", "content": message.message}
-        query_desc_1 = f"INSERT INTO chat_messages {user_message_data}"
-        log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_1)
-        supabase.table("chat_messages").insert(user_message_data).execute()
-
-        # 2. Get AI context from the database
-        rpc_params = {"p_user_id": user.id, "p_user_query": message.message}
-        query_desc_2 = f"RPC: get_ai_context with params {rpc_params}"
-        log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_2)
-        context_response = supabase.rpc("get_ai_context", rpc_params).execute()
-        db_context = context_response.data if context_response.data else ""
+        # 1. Start fetching the AI context, and spool the user's message meanwhile
+        context_future = chat_context_pool.submit(fetch_ai_context, user.id, message.message)
+        spool_chat_message(user.id, "user", message.message)
+
+        # "What should I plant this month?" is answered from the precomputed advisories.
+        if is_monthly_question(message.message):
+            bot_reply = advisory_service.answer(message.message, get_user_district_name(user), datetime.now().month)
+        else:
+            bot_reply = None
+        if bot_reply:
+            context_future.cancel()
+            spool_chat_message(user.id, "bot", bot_reply)
+            return {"reply": bot_reply}
+
+        # 2. Wait for the AI context
+        db_context = context_future.result()
 
         system_prompt = f"You are a helpful farming assistant. Use the following context to answer the user's question:\n{db_context}"
         full_prompt = f"{system_prompt}\n\nUser's question: {message.message}"
 
         # 3. Call Gemini AI
         model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(full_prompt)
+        with gemini_limiter.slot():
+            response = model.generate_content(full_prompt, request_options={"timeout": GEMINI_TIMEOUT_SECONDS})
         bot_reply = response.text
 
-        # 4. Save bot's reply
-        bot_message_data = {"user_id": user.id, "sender": "bot", "content": bot_reply}
-        query_desc_3 = f"INSERT INTO chat_messages {bot_message_data}"
-        log_query(supabase, user.id, user.user_metadata.get('full_name'), query_desc_3)
-        supabase.table("chat_messages").insert(bot_message_data).execute()
+        # 4. Spool the bot's reply
+        spool_chat_message(user.id, "bot", bot_reply)
 
         return {"reply": bot_reply}
 
+    except UpstreamSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
 
+# --- Admin Endpoints ---
+
+@app.get("/admin/upstream-stats")
+def get_upstream_stats(user=Depends(require_admin)):
+    """Returns queue depth, in-flight calls and rejection counts for the AI upstreams and the chat write spool."""
+    return {
+        "gemini": gemini_limiter.stats(),
+        "tts": tts_limiter.stats(),
+        "ai_rate_limit": ai_rate_limiter.stats(),
+        "chat_write_behind": chat_write_queue.stats(),
+    }
+
+@app.get("/admin/query-stats")
+def get_query_stats(user=Depends(require_admin)):
+    """Returns per-template query counts, errors and latency percentiles since this worker started."""
+    return query_stats.snapshot()
+
+# --- Delta Sync Endpoint ---
+
+# Rows are stamped with the transaction start time, so a write that commits just after a sync
+# can carry an updated_at slightly older than the cursor handed out. Each delta re-reads this
+# window; clients apply rows as idempotent upserts, so the overlap only costs a few duplicates.
+SYNC_CURSOR_OVERLAP = timedelta(seconds=5)
+
+def parse_sync_cursor(since: Optional[str]) -> Optional[str]:
+    """Turns a client cursor into the lower bound for updated_at, or None for a full sync."""
+    if not since:
+        return None
+    try:
+        cursor_time = datetime.fromisoformat(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync cursor.")
+    if cursor_time.tzinfo is None:
+        cursor_time = cursor_time.replace(tzinfo=timezone.utc)
+    return (cursor_time - SYNC_CURSOR_OVERLAP).isoformat()
+
+@app.get("/sync")
+def sync_changes(since: Optional[str] = None, user=Depends(get_current_user)):
+    """
+    Returns the farms, plots, plantings, activities and chat messages changed since the cursor,
+    the ids of those deleted since then, and a new cursor. Without a cursor everything is returned.
+    """
+    lower_bound = parse_sync_cursor(since)
+    next_cursor = datetime.now(timezone.utc).isoformat()
+    since_sql = f" AND updated_at > '{lower_bound}'" if lower_bound else ""
+
+    def changed_since(query, column="updated_at"):
+        return query.gt(column, lower_bound) if lower_bound else query
+
+    query_desc_1 = f"SELECT * FROM farms WHERE owner_id = {user.id}{since_sql}"
+    farms = execute_query(query_desc_1, changed_since(supabase.table("farms").select("*").eq("owner_id", user.id))).data
+
+    query_desc_2 = f"SELECT farm_plots.* FROM farm_plots JOIN farms USING (farm_id) WHERE owner_id = {user.id}{since_sql}"
+    plots = execute_query(query_desc_2, changed_since(
+        supabase.table("farm_plots").select("*, farms!inner(owner_id)").eq("farms.owner_id", user.id)
+    )).data
+
+    query_desc_3 = f"SELECT plantings.* FROM plantings JOIN farm_plots USING (plot_id) JOIN farms USING (farm_id) WHERE owner_id = {user.id}{since_sql}"
+    plantings = execute_query(query_desc_3, changed_since(
+        supabase.table("plantings").select("*, farm_plots!inner(farms!inner(owner_id))").eq("farm_plots.farms.owner_id", user.id)
+    )).data
+
+    query_desc_4 = f"SELECT * FROM user_activities WHERE owner_id = {user.id}{since_sql}"
+    activities = execute_query(query_desc_4, changed_since(supabase.table("user_activities").select("*").eq("owner_id", user.id))).data
+
+    query_desc_5 = f"SELECT message_id, sender, content, created_at, updated_at FROM chat_messages WHERE user_id = {user.id}{since_sql}"
+    chat_messages = execute_query(query_desc_5, changed_since(
+        supabase.table("chat_messages").select("message_id, sender, content, created_at, updated_at").eq("user_id", user.id)
+    )).data
+
+    # The embedded owner filters are only there for the join; don't send them to the client.
+    for plot in plots:
+        plot.pop("farms", None)
+    for planting in plantings:
+        planting.pop("farm_plots", None)
+
+    deleted = {"farms": [], "plots": [], "plantings": [], "activities": [], "chat_messages": []}
+    if lower_bound:
+        query_desc_6 = f"SELECT entity, entity_id FROM sync_tombstones WHERE owner_id = {user.id} AND deleted_at > '{lower_bound}'"
+        tombstones = execute_query(query_desc_6, changed_since(
+            supabase.table("sync_tombstones").select("entity, entity_id").eq("owner_id", user.id), column="deleted_at"
+        )).data
+        for tombstone in tombstones:
+            deleted[tombstone["entity"]].append(tombstone["entity_id"])
+
+    return {
+        "cursor": next_cursor,
+        "full": lower_bound is None,
+        "farms": farms,
+        "plots": plots,
+        "plantings": plantings,
+        "activities": activities,
+        "chat_messages": chat_messages,
+        "deleted": deleted,
+    }
+
 # --- Main Execution ---
 if __name__ == "__main__":
     import uvicorn
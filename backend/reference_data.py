@@ -0,0 +1,92 @@
+"""
+Reference Data Versioning
+Tracks the version counters kept in `reference_data_versions` so that caches built from
+the agriculture reference tables are rebuilt only when those tables change, or when a new
+reference snapshot (see reference_snapshot.py) is published.
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+from supabase import Client
+
+from reference_snapshot import SnapshotStore
+
+# How often (in seconds) a watcher re-reads the version table.
+VERSION_CHECK_INTERVAL_SECONDS = 60
+# Key under which a watcher records the snapshot version alongside the table versions.
+SNAPSHOT_VERSION_KEY = "reference_snapshot"
+
+
+def fetch_reference_versions(supabase_client: Client) -> Optional[Dict[str, int]]:
+    """
+    Reads the current version of every reference table.
+
+    Returns None if the version table is unavailable (e.g. migration 19 not applied),
+    in which case callers should keep serving whatever they last built.
+    """
+    try:
+        response = supabase_client.table("reference_data_versions").select("table_name, version").execute()
+        return {row["table_name"]: int(row["version"]) for row in response.data or []}
+    except Exception as e:
+        print(f"Warning: Could not read reference_data_versions. Error: {e}")
+        return None
+
+
+class ReferenceDataWatcher:
+    """Rate-limited check for changes to the reference tables."""
+
+    def __init__(
+        self,
+        supabase_client: Client,
+        check_interval: float = VERSION_CHECK_INTERVAL_SECONDS,
+        snapshots: Optional[SnapshotStore] = None,
+    ):
+        self.supabase = supabase_client
+        self.check_interval = check_interval
+        self.snapshots = snapshots
+        self.versions: Optional[Dict[str, int]] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version_tag(self) -> str:
+        """A short string identifying the data version the caller last built from."""
+        if not self.versions:
+            return "v0"
+        return "v" + "-".join(str(self.versions[name]) for name in sorted(self.versions))
+
+    def begin_build(self) -> Optional[Dict[str, int]]:
+        """
+        Reads the versions a rebuild is about to load. Call this before fetching the
+        rows, so a change that lands mid-build is picked up by the next check.
+        """
+        return self._current_versions()
+
+    def _current_versions(self) -> Optional[Dict[str, int]]:
+        versions = fetch_reference_versions(self.supabase)
+        if self.snapshots is None:
+            return versions
+        return dict(versions or {}, **{SNAPSHOT_VERSION_KEY: self.snapshots.version()})
+
+    def mark_built(self, versions: Optional[Dict[str, int]]) -> None:
+        """Records the versions the caller's cache was built from."""
+        with self._lock:
+            self.versions = versions
+            self._last_check = time.monotonic()
+
+    def has_changed(self) -> bool:
+        """Returns True if the reference tables changed since the last build."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_check < self.check_interval:
+                return False
+            self._last_check = now
+            latest = self._current_versions()
+            if latest is None:
+                return False
+            if self.versions is None:
+                return True
+            # While the version table is unreachable only the snapshot version is compared.
+            return any(self.versions.get(name) != version for name, version in latest.items())
@@ -0,0 +1,417 @@
+"""
+Reference Data Snapshot - Memory-Mapped Binary Copy of the Agriculture Reference Tables
+Compiles historical_agriculture_data and comprehensive_agriculture_data into fixed-layout NumPy
+files that every API worker memory-maps read-only, so all workers on a host share one copy in the
+page cache and startup needs neither CSV parsing nor a Supabase fetch.
+
+Layout of the snapshot directory:
+    CURRENT                 name of the active version (replaced atomically)
+    <version>/manifest.json format, build time, source, content hash, row counts and table versions
+    <version>/strings.npy   every distinct text value, as fixed-width unicode
+    <version>/<table>.npy   one structured record per row; text columns hold indexes into strings.npy
+
+A new snapshot is written to a temporary directory, renamed into place, and then published by
+replacing CURRENT, so readers always see either the old or the new version in full.
+
+A database build records the `reference_data_versions` counters it was read at. The API reads a
+table from the snapshot only while its counter is unchanged, and from Supabase once the table is
+edited. A CSV build records no counters and is only used while the counters cannot be read, so
+deployments build from the database.
+
+Usage:
+    python reference_snapshot.py --from-database   # compile the tables as they are in Supabase
+    python reference_snapshot.py                   # compile the reference CSVs in backend/ (local use)
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+REFERENCE_SNAPSHOT_DIR = os.getenv("REFERENCE_SNAPSHOT_DIR", os.path.join(BACKEND_DIR, "reference_snapshot"))
+FORMAT_VERSION = 1
+CURRENT_POINTER = "CURRENT"
+KEEP_VERSIONS = 2
+PAGE_SIZE = 1000
+
+# Column layouts per table: "text" columns are stored as int32 indexes into strings.npy (-1 for NULL),
+# float columns use NaN for NULL.
+TABLE_SCHEMAS: Dict[str, List[Tuple[str, str]]] = {
+    "historical_agriculture_data": [
+        ("historical_data_id", "i8"),
+        ("crop_name", "text"),
+        ("district_name", "text"),
+        ("year", "i4"),
+        ("season", "text"),
+        ("area_hectares", "f8"),
+        ("production_tonnes", "f8"),
+        ("productivity_tonnes_per_hectare", "f8"),
+        ("weather_impact_factor", "f8"),
+        ("sowing_period", "text"),
+        ("harvest_period", "text"),
+    ],
+    "comprehensive_agriculture_data": [
+        ("comprehensive_data_id", "i8"),
+        ("district_name", "text"),
+        ("category", "text"),
+        ("crop_name", "text"),
+        ("season", "text"),
+        ("planting_period", "text"),
+        ("harvest_period", "text"),
+        ("is_major_district", "?"),
+        ("cultivation_type", "text"),
+    ],
+}
+
+# CSV sources for each table, with the same column mapping populate_new_tables.py uses.
+CSV_SOURCES = {
+    "historical_agriculture_data": ("kerala_agriculture_10year_historical_data.csv", {
+        'Crop': 'crop_name',
+        'District': 'district_name',
+        'Year': 'year',
+        'Season': 'season',
+        'Area_Hectares': 'area_hectares',
+        'Production_Tonnes': 'production_tonnes',
+        'Productivity_Tonnes_per_Hectare': 'productivity_tonnes_per_hectare',
+        'Weather_Impact_Factor': 'weather_impact_factor',
+        'Sowing_Period': 'sowing_period',
+        'Harvest_Period': 'harvest_period'
+    }),
+    "comprehensive_agriculture_data": ("kerala_comprehensive_agriculture_data.csv", {
+        'District': 'district_name',
+        'Category': 'category',
+        'Crop': 'crop_name',
+        'Season': 'season',
+        'Planting_Period': 'planting_period',
+        'Harvest_Period': 'harvest_period',
+        'Is_Major_District': 'is_major_district',
+        'Cultivation_Type': 'cultivation_type'
+    }),
+}
+
+
+def _record_dtype(schema: List[Tuple[str, str]]) -> np.dtype:
+    return np.dtype([(name, "<i4" if kind == "text" else kind) for name, kind in schema])
+
+
+def _encode_table(table: str, rows: List[Dict], strings: Dict[str, int]) -> np.ndarray:
+    schema = TABLE_SCHEMAS[table]
+    return np.array(
+        [tuple(_convert(row.get(name), kind, strings) for name, kind in schema) for row in rows],
+        dtype=_record_dtype(schema),
+    )
+
+
+def _strings_array(strings: Dict[str, int]) -> np.ndarray:
+    width = max([len(s) for s in strings] + [1])
+    return np.array(list(strings), dtype=f"<U{width}")
+
+
+def encode_rows(table: str, rows: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts rows in the shape the Supabase client returns into the snapshot layout: the table's
+    structured records and the strings their text columns index. Missing columns are stored as NULL.
+    """
+    strings: Dict[str, int] = {}
+    records = _encode_table(table, rows, strings)
+    return records, _strings_array(strings)
+
+
+def decode_rows(table: str, records: np.ndarray, strings: np.ndarray) -> List[Dict]:
+    """Returns records in the snapshot layout as dicts, in the shape the Supabase client returns them."""
+    columns = []
+    for name, kind in TABLE_SCHEMAS[table]:
+        values = records[name]
+        if kind == "text":
+            columns.append([None if c < 0 else str(strings[c]) for c in values.tolist()])
+        elif kind == "f8":
+            columns.append([None if v != v else v for v in values.tolist()])
+        else:
+            columns.append(values.tolist())
+    names = [name for name, _ in TABLE_SCHEMAS[table]]
+    return [dict(zip(names, values)) for values in zip(*columns)]
+
+
+def read_csv_tables(directory: str = BACKEND_DIR) -> Dict[str, List[Dict]]:
+    """Reads the reference CSVs into rows keyed by table, numbering ids as a fresh import would."""
+    tables = {}
+    for table, (filename, columns) in CSV_SOURCES.items():
+        id_column = TABLE_SCHEMAS[table][0][0]
+        with open(os.path.join(directory, filename), newline="", encoding="utf-8") as f:
+            tables[table] = [
+                dict({column: row[source] for source, column in columns.items()}, **{id_column: i})
+                for i, row in enumerate(csv.DictReader(f), start=1)
+            ]
+    return tables
+
+
+def read_database_tables(supabase_client) -> Dict[str, List[Dict]]:
+    """Reads the reference tables from Supabase, page by page."""
+    tables = {}
+    for table, schema in TABLE_SCHEMAS.items():
+        rows: List[Dict] = []
+        start = 0
+        while True:
+            response = supabase_client.table(table).select(
+                ", ".join(name for name, _ in schema)
+            ).order(schema[0][0]).range(start, start + PAGE_SIZE - 1).execute()
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                break
+            start += PAGE_SIZE
+        tables[table] = rows
+    return tables
+
+
+def _convert(value, kind: str, strings: Dict[str, int]):
+    if value is None or value == "":
+        return -1 if kind == "text" else (np.nan if kind == "f8" else 0)
+    if kind == "text":
+        return strings.setdefault(str(value), len(strings))
+    if kind == "?":
+        return value if isinstance(value, bool) else str(value).strip().lower() == "true"
+    return float(value) if kind == "f8" else int(value)
+
+
+def _fsync_directory(path: str) -> None:
+    if os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_array(path: str, array: np.ndarray) -> None:
+    with open(path, "wb") as f:
+        np.save(f, array, allow_pickle=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def build_snapshot(
+    tables: Dict[str, List[Dict]],
+    source: str,
+    root: str = REFERENCE_SNAPSHOT_DIR,
+    table_versions: Optional[Dict[str, int]] = None,
+) -> str:
+    """
+    Writes `tables` as a new snapshot version under `root` and makes it current.
+    `table_versions` are the reference_data_versions counters read before the tables were.
+    Returns the version name; rebuilding identical data republishes the existing version.
+    """
+    strings: Dict[str, int] = {}
+    arrays = {table: _encode_table(table, tables[table], strings) for table in TABLE_SCHEMAS}
+    arrays["strings"] = _strings_array(strings)
+
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        digest.update(name.encode("utf-8"))
+        digest.update(str(arrays[name].dtype.descr).encode("utf-8"))
+        digest.update(arrays[name].tobytes())
+    digest.update(json.dumps(table_versions, sort_keys=True).encode("utf-8"))
+    content_hash = digest.hexdigest()
+
+    os.makedirs(root, exist_ok=True)
+    for existing in _versions(root):
+        manifest = _read_manifest(os.path.join(root, existing))
+        if manifest and manifest.get("content_hash") == content_hash and manifest.get("format") == FORMAT_VERSION:
+            _publish(root, existing)
+            return existing
+
+    built_at = int(time.time())
+    version = f"v{built_at}-{content_hash[:12]}"
+    staging = os.path.join(root, f".{version}.tmp-{os.getpid()}")
+    os.makedirs(staging)
+    try:
+        for name, array in arrays.items():
+            _write_array(os.path.join(staging, f"{name}.npy"), array)
+        manifest = {
+            "format": FORMAT_VERSION,
+            "version": version,
+            "built_at": built_at,
+            "source": source,
+            "content_hash": content_hash,
+            "row_counts": {table: len(arrays[table]) for table in TABLE_SCHEMAS},
+            "table_versions": table_versions,
+        }
+        with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        _fsync_directory(staging)
+        os.replace(staging, os.path.join(root, version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    _publish(root, version)
+    _prune(root, keep=KEEP_VERSIONS)
+    return version
+
+
+def _publish(root: str, version: str) -> None:
+    """Atomically points CURRENT at `version`."""
+    pointer = os.path.join(root, CURRENT_POINTER)
+    staging = f"{pointer}.tmp-{os.getpid()}"
+    with open(staging, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(staging, pointer)
+    _fsync_directory(root)
+
+
+def _versions(root: str) -> List[str]:
+    """Returns the complete versions under `root`, oldest first."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if name.startswith("v") and os.path.isfile(os.path.join(root, name, "manifest.json"))
+    )
+
+
+def _read_manifest(path: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _prune(root: str, keep: int) -> None:
+    """Deletes all but the newest `keep` versions. Workers still mapping a deleted version keep reading it."""
+    current = read_current_version(root)
+    for name in _versions(root)[:-keep]:
+        if name != current:
+            # Windows refuses to delete mapped files; the version is pruned on a later build instead.
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def read_current_version(root: str = REFERENCE_SNAPSHOT_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(root, CURRENT_POINTER), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+class ReferenceSnapshot:
+    """One memory-mapped snapshot version."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.manifest = _read_manifest(path)
+        if not self.manifest or self.manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a format {FORMAT_VERSION} reference snapshot")
+        self.version: str = self.manifest["version"]
+        self.built_at: int = self.manifest["built_at"]
+        # A numeric identifier of the content, for the version comparison in reference_data.py.
+        self.content_version = int(self.manifest["content_hash"][:12], 16)
+        self.table_versions: Optional[Dict[str, int]] = self.manifest.get("table_versions")
+        self.strings = np.load(os.path.join(path, "strings.npy"), mmap_mode="r", allow_pickle=False)
+        self.tables = {
+            table: np.load(os.path.join(path, f"{table}.npy"), mmap_mode="r", allow_pickle=False)
+            for table in TABLE_SCHEMAS
+        }
+
+    def is_current(self, table: str, versions: Optional[Dict[str, int]]) -> bool:
+        """
+        True if the snapshot holds `table` as of `versions` (the reference_data_versions counters).
+        Without a counter to compare against, the snapshot is trusted.
+        """
+        if not versions or table not in versions:
+            return True
+        return (self.table_versions or {}).get(table) == versions[table]
+
+
+class SnapshotStore:
+    """Gives access to the current snapshot under a directory, remapping when CURRENT changes."""
+
+    def __init__(self, root: str = REFERENCE_SNAPSHOT_DIR):
+        self.root = root
+        self._snapshot: Optional[ReferenceSnapshot] = None
+
+    def current(self) -> Optional[ReferenceSnapshot]:
+        """Returns the current snapshot, or None if none has been built or it cannot be read."""
+        version = read_current_version(self.root)
+        if version is None:
+            return None
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.version != version:
+            try:
+                snapshot = ReferenceSnapshot(os.path.join(self.root, version))
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not open reference snapshot {version}. Error: {e}")
+                return self._snapshot
+            self._snapshot = snapshot
+        return snapshot
+
+    def table(self, table: str, versions: Optional[Dict[str, int]]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Returns the mapped records of `table` and the strings they index, or None if there is no
+        snapshot or it predates the table version in `versions`; the caller then reads Supabase.
+        """
+        snapshot = self.current()
+        if snapshot is None:
+            return None
+        if not snapshot.is_current(table, versions):
+            print(f"Reference snapshot {snapshot.version} predates the current {table}; reading it from the database.")
+            return None
+        return snapshot.tables[table], snapshot.strings
+
+    def version(self) -> int:
+        """The content version of the current snapshot (0 if there is none), for change detection."""
+        snapshot = self.current()
+        return snapshot.content_version if snapshot else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compile the agriculture reference data into a memory-mapped snapshot.")
+    parser.add_argument("--from-database", action="store_true", help="read the tables from Supabase instead of the CSVs")
+    parser.add_argument("--output", default=REFERENCE_SNAPSHOT_DIR, help=f"snapshot directory (default: {REFERENCE_SNAPSHOT_DIR})")
+    args = parser.parse_args()
+
+    table_versions = None
+    if args.from_database:
+        from dotenv import load_dotenv
+        from supabase import create_client
+
+        from reference_data import fetch_reference_versions
+
+        load_dotenv("../.env")
+        load_dotenv()
+        supabase_url = os.getenv("VITE_SUPABASE_URL")
+        supabase_key = os.getenv("VITE_SUPABASE_ANON_KEY")
+        if not all([supabase_url, supabase_key]):
+            raise RuntimeError("One or more environment variables are missing.")
+        supabase_client = create_client(supabase_url, supabase_key)
+        # Read the counters first, so an edit made while the tables are read marks the snapshot stale.
+        table_versions = fetch_reference_versions(supabase_client)
+        if table_versions is None:
+            raise RuntimeError("reference_data_versions could not be read; apply database script 19 first.")
+        table_versions = {table: table_versions[table] for table in TABLE_SCHEMAS if table in table_versions}
+        tables = read_database_tables(supabase_client)
+        source = "database"
+    else:
+        tables = read_csv_tables()
+        source = "csv"
+
+    version = build_snapshot(tables, source, args.output, table_versions)
+    counts = ", ".join(f"{len(rows)} {table}" for table, rows in tables.items())
+    print(f"✅ Reference snapshot {version} is current ({counts}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""
+Response Helpers - Fast JSON Serialization and Field Projection
+Lets list endpoints push a `?fields=` projection down into the Supabase select and return the
+database rows directly, without per-row Pydantic validation or jsonable_encoder passes.
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library encoder.
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson when available."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def build_select(fields: Optional[str], columns: Dict[str, str], default: str) -> str:
+    """
+    Turns a comma-separated `fields` parameter into a Supabase select string.
+
+    `columns` maps each field a client may request to its select fragment (a plain column,
+    or an embedded resource such as "crop:crops(crop_id, crop_name)"). Without `fields`
+    the endpoint's default select is used, so existing clients see no change.
+    """
+    if not fields:
+        return default
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in columns]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(columns)}",
+        )
+    # dict.fromkeys drops duplicates while keeping the client's order.
+    return ", ".join(columns[f] for f in dict.fromkeys(requested))
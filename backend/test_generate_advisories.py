@@ -0,0 +1,129 @@
+"""Checks for the advisory batch job, run with FakeAdvisoryModel in place of Gemini."""
+
+import generate_advisories
+from advisory_service import advisory_key
+from generate_advisories import FakeAdvisoryModel, build_context, generate_one, merge_crop_rows, pending_contexts
+
+ROW = {
+    "district_name": "Kasargod",
+    "crop_name": "Coconut",
+    "category": "Plantation",
+    "planting_period": "May-June",
+    "harvest_period": "Year-round",
+    "cultivation_type": "Intensive",
+}
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeTable:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.row = None
+
+    def upsert(self, row, on_conflict):
+        self.row = row
+        return self
+
+    def execute(self):
+        if self.client.failures_left:
+            self.client.failures_left -= 1
+            raise ConnectionError("Supabase unavailable")
+        self.client.upserts.append((self.name, self.row))
+        return FakeResponse([self.row])
+
+
+class FakeSupabase:
+    """Records upserts; the first `failures` executions raise."""
+
+    def __init__(self, failures=0):
+        self.failures_left = failures
+        self.upserts = []
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+
+class FakeYields:
+    def forecast(self, crop=None, district=None):
+        return []
+
+
+class FlakyModel(FakeAdvisoryModel):
+    """Fails the first call, then behaves like the fake model."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, context):
+        self.calls += 1
+        if self.calls == 1:
+            raise TimeoutError("model timed out")
+        return super().generate(context)
+
+
+def test_pending_contexts_skips_stored_advisories():
+    existing = {advisory_key("Kasaragod", "coconut", month) for month in (1, 2, 3)}
+
+    contexts = pending_contexts([ROW], FakeYields(), existing)
+
+    assert [c["month"] for c in contexts] == list(range(4, 13))
+
+
+def test_generate_one_stores_fake_advisory():
+    supabase = FakeSupabase()
+    context = build_context(ROW, 6, [])
+
+    assert generate_one(supabase, FakeAdvisoryModel(), context, retries=0) is None
+
+    table, row = supabase.upserts[0]
+    assert table == "crop_advisories"
+    assert (row["district_name"], row["crop_name"], row["month"], row["model"]) == ("Kasargod", "Coconut", 6, "fake")
+    assert row["advisory"] == FakeAdvisoryModel().generate(context)
+
+
+def test_generate_one_retries_until_success(monkeypatch):
+    monkeypatch.setattr(generate_advisories, "RETRY_BACKOFF_SECONDS", 0)
+    supabase = FakeSupabase(failures=1)
+    model = FlakyModel()
+
+    # Attempt 1: the model fails; attempt 2: the upsert fails; attempt 3 succeeds.
+    assert generate_one(supabase, model, build_context(ROW, 6, []), retries=2) is None
+
+    assert model.calls == 3
+    assert len(supabase.upserts) == 1
+
+
+def test_generate_one_reports_error_when_retries_run_out(monkeypatch):
+    monkeypatch.setattr(generate_advisories, "RETRY_BACKOFF_SECONDS", 0)
+    supabase = FakeSupabase(failures=5)
+
+    error = generate_one(supabase, FakeAdvisoryModel(), build_context(ROW, 6, []), retries=1)
+
+    assert error == "Supabase unavailable"
+    assert supabase.upserts == []
+
+
+def test_merge_crop_rows_combines_seasons_of_a_crop():
+    rows = [
+        dict(ROW, district_name="Palakkad", crop_name="Rice", season="Virippu", planting_period="April-May", harvest_period="August-September"),
+        dict(ROW, district_name="Palakkad", crop_name="Rice", season="Mundakan", planting_period="September-October", harvest_period="December-January"),
+        dict(ROW, district_name="Palakkad", crop_name="Rice", season="Puncha", planting_period="December-January", harvest_period="March-April"),
+        dict(ROW, season="Perennial"),
+    ]
+
+    merged = merge_crop_rows(rows)
+
+    assert len(merged) == 2
+    rice = merged[0]
+    assert rice["season"] == "Virippu, Mundakan, Puncha"
+    assert rice["planting_period"] == "April-May, September-October, December-January"
+    # One advisory per month, whose stage reflects every season of the crop.
+    contexts = pending_contexts([rice], FakeYields(), set())
+    assert len(contexts) == 12
+    assert {c["month"] for c in contexts if c["stage"] == "Planting"} == {1, 4, 5, 9, 10, 12}
+    assert {c["month"] for c in contexts if c["stage"] == "Harvest"} == {3, 8}
@@ -0,0 +1,83 @@
+"""
+Text-to-Speech Chunking
+Splits chat answers into sentence-aligned chunks for English and Malayalam so long texts stay
+under the synthesis input limit and the first chunk can be synthesized and played quickly.
+"""
+
+import re
+from typing import List
+
+# Google TTS accepts at most 5000 bytes of input per request; Malayalam is 3 bytes per
+# character in UTF-8, so chunks are measured in bytes rather than characters.
+MAX_CHUNK_BYTES = 1500
+# The first chunk is kept short so audio starts as soon as possible.
+FIRST_CHUNK_BYTES = 300
+
+# Sentence ends: Latin punctuation (also used in Malayalam text), the Devanagari danda that
+# sometimes appears in Indic text, and line breaks.
+_SENTENCE_END = re.compile(r"(?<=[.!?।॥])\s+|\n+")
+_CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
+
+
+def _byte_length(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def _split_long(sentence: str, limit: int) -> List[str]:
+    """Breaks a sentence longer than `limit` bytes at clause boundaries, then at spaces."""
+    if _byte_length(sentence) <= limit:
+        return [sentence]
+
+    pieces: List[str] = []
+    for separator in (_CLAUSE_END, re.compile(r"\s+")):
+        parts = separator.split(sentence)
+        if len(parts) > 1:
+            current = ""
+            for part in parts:
+                candidate = f"{current} {part}".strip()
+                if current and _byte_length(candidate) > limit:
+                    pieces.extend(_split_long(current, limit))
+                    current = part
+                else:
+                    current = candidate
+            if current:
+                pieces.extend(_split_long(current, limit))
+            return pieces
+
+    # A single unbroken word: cut on character boundaries.
+    current = ""
+    for char in sentence:
+        if _byte_length(current + char) > limit:
+            pieces.append(current)
+            current = ""
+        current += char
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_sentences(text: str) -> List[str]:
+    """Splits text into sentences, dropping empty fragments."""
+    return [s.strip() for s in _SENTENCE_END.split(text) if s and s.strip()]
+
+
+def chunk_text(text: str, max_bytes: int = MAX_CHUNK_BYTES, first_chunk_bytes: int = FIRST_CHUNK_BYTES) -> List[str]:
+    """
+    Packs sentences into chunks of at most `max_bytes`, never splitting a sentence unless it
+    alone exceeds the limit. The first chunk is capped at `first_chunk_bytes`.
+    """
+    chunks: List[str] = []
+    current = ""
+    for sentence in split_sentences(text):
+        limit = first_chunk_bytes if not chunks else max_bytes
+        for piece in _split_long(sentence, limit):
+            limit = first_chunk_bytes if not chunks else max_bytes
+            candidate = f"{current} {piece}".strip()
+            if current and _byte_length(candidate) > limit:
+                chunks.append(current)
+                current = piece
+            else:
+                current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,103 @@
+"""
+Kerala Weather Service - Batched Open-Meteo Forecasts
+Fetches forecasts for many locations in a single multi-coordinate Open-Meteo request and parses
+the hourly and daily blocks into a compact columnar form.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from crop_calendar_service import normalize_district
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+REQUEST_TIMEOUT_SECONDS = 10
+
+CURRENT_FIELDS = ["temperature_2m", "relative_humidity_2m", "wind_speed_10m", "is_day"]
+HOURLY_FIELDS = ["temperature_2m", "relative_humidity_2m", "precipitation_probability", "precipitation"]
+DAILY_FIELDS = ["temperature_2m_max", "temperature_2m_min", "precipitation_sum", "precipitation_probability_max"]
+
+# Approximate district headquarters coordinates, used when a farm has no stored location.
+DISTRICT_CENTROIDS: Dict[str, Tuple[float, float]] = {
+    "thiruvananthapuram": (8.5241, 76.9366),
+    "kollam": (8.8932, 76.6141),
+    "pathanamthitta": (9.2648, 76.7870),
+    "alappuzha": (9.4981, 76.3388),
+    "kottayam": (9.5916, 76.5222),
+    "idukki": (9.8497, 76.9681),
+    "ernakulam": (9.9816, 76.2999),
+    "thrissur": (10.5276, 76.2144),
+    "palakkad": (10.7867, 76.6548),
+    "malappuram": (11.0510, 76.0711),
+    "kozhikode": (11.2588, 75.7804),
+    "wayanad": (11.6854, 76.1320),
+    "kannur": (11.8745, 75.3704),
+    "kasaragod": (12.4996, 74.9869),
+}
+
+
+def district_centroid(district_name: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Returns the (lat, lon) used for a district, or None if it is unknown."""
+    return DISTRICT_CENTROIDS.get(normalize_district(district_name))
+
+
+def _compact_series(block: Optional[Dict], fields: List[str]) -> Optional[Dict]:
+    """
+    Converts an Open-Meteo hourly/daily block into {"start", "step_seconds", "count", "values"},
+    replacing the per-entry timestamp list with a start time and a fixed step.
+    """
+    if not block or not block.get("time"):
+        return None
+    times = block["time"]
+    step_seconds = None
+    if len(times) > 1:
+        step_seconds = int((datetime.fromisoformat(times[1]) - datetime.fromisoformat(times[0])).total_seconds())
+    return {
+        "start": times[0],
+        "step_seconds": step_seconds,
+        "count": len(times),
+        "values": {field: block.get(field) for field in fields},
+    }
+
+
+def fetch_batch_forecast(locations: List[Tuple[float, float]], forecast_days: int = 3) -> List[Dict]:
+    """
+    Fetches forecasts for all `locations` in one upstream request.
+
+    Returns one parsed result per location, in the same order. Raises requests exceptions
+    on network or HTTP errors so the caller can map them to an HTTP response.
+    """
+    if not locations:
+        return []
+
+    params = {
+        "latitude": ",".join(f"{lat:.4f}" for lat, _ in locations),
+        "longitude": ",".join(f"{lon:.4f}" for _, lon in locations),
+        "current": ",".join(CURRENT_FIELDS),
+        "hourly": ",".join(HOURLY_FIELDS),
+        "daily": ",".join(DAILY_FIELDS),
+        "forecast_days": forecast_days,
+        "timezone": "Asia/Kolkata",
+    }
+    response = requests.get(OPEN_METEO_URL, params=params, timeout=REQUEST_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    payload = response.json()
+    # Open-Meteo returns a single object for one location and a list for several.
+    results = payload if isinstance(payload, list) else [payload]
+
+    parsed = []
+    for result in results:
+        current = result.get("current", {})
+        parsed.append({
+            "current": {
+                "temperature": current.get("temperature_2m"),
+                "humidity": current.get("relative_humidity_2m"),
+                "windSpeed": current.get("wind_speed_10m"),
+                "condition": "sunny" if current.get("is_day", 1) else "cloudy",
+                "time": current.get("time"),
+            },
+            "hourly": _compact_series(result.get("hourly"), HOURLY_FIELDS),
+            "daily": _compact_series(result.get("daily"), DAILY_FIELDS),
+        })
+    return parsed
@@ -0,0 +1,220 @@
+"""
+Write-Behind Queue for Supabase Inserts
+Spools rows to a local SQLite file and replays them to Supabase from a background thread, so a
+request only waits for a local commit. Spooled rows survive a crash or restart and are replayed
+on the next start. Replays are upserts on a client-generated key, so a row that reached Supabase
+just before a crash is not inserted twice.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+from supabase import Client
+
+from db_query import execute_query
+
+WRITE_BEHIND_SPOOL_PATH = os.getenv(
+    "WRITE_BEHIND_SPOOL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "write_behind_spool.sqlite3")
+)
+BATCH_SIZE = 200
+# Seconds between replay attempts while Supabase is unreachable, doubling up to MAX_BACKOFF_SECONDS.
+RETRY_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+# A row Supabase keeps rejecting is set aside after this many attempts.
+MAX_ATTEMPTS = 10
+# SQLSTATE classes meaning the row itself is at fault (22: data exception, 23: integrity constraint),
+# as opposed to Supabase being unreachable or the schema not being migrated yet.
+REJECTED_SQLSTATE_CLASSES = ("22", "23")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_writes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    on_conflict TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    user_id TEXT,
+    enqueued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    dead INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_pending_writes_live ON pending_writes(dead, id);
+"""
+
+USER_INDEX = "CREATE INDEX IF NOT EXISTS idx_pending_writes_user ON pending_writes(table_name, user_id, dead, id);"
+
+
+def is_rejection(error: Exception) -> bool:
+    """True if Supabase refused the row itself, rather than failing to take any write."""
+    code = getattr(error, "code", None) if isinstance(error, APIError) else None
+    return isinstance(code, str) and len(code) == 5 and code[:2] in REJECTED_SQLSTATE_CLASSES
+
+
+class WriteBehindQueue:
+    def __init__(self, path: str = WRITE_BEHIND_SPOOL_PATH):
+        """Opens (or creates) the spool file; rows left from a previous run are replayed once started."""
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # FULL makes each enqueue durable once it returns, at the cost of an fsync per write.
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(pending_writes)")}
+        if "user_id" not in columns:
+            # Spool files written before rows were indexed by user.
+            self._db.execute("ALTER TABLE pending_writes ADD COLUMN user_id TEXT")
+            self._db.execute("UPDATE pending_writes SET user_id = json_extract(payload, '$.user_id')")
+        self._db.execute(USER_INDEX)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._replayed = 0
+        self._failed_attempts = 0
+        self._last_error: Optional[str] = None
+
+    def enqueue(self, table: str, row: Dict, on_conflict: str) -> None:
+        """Durably spools one row for `table`; `on_conflict` names the client-generated unique key."""
+        user_id = row.get("user_id")
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO pending_writes (table_name, on_conflict, payload, user_id, enqueued_at) VALUES (?, ?, ?, ?, ?)",
+                (table, on_conflict, json.dumps(row, default=str), None if user_id is None else str(user_id), time.time()),
+            )
+        self._wake.set()
+
+    def pending(self, table: str, user_id: str) -> List[Dict]:
+        """Returns a user's spooled rows for `table`, oldest first."""
+        with self._lock:
+            payloads = self._db.execute(
+                "SELECT payload FROM pending_writes WHERE table_name = ? AND user_id = ? AND dead = 0 ORDER BY id",
+                (table, str(user_id)),
+            ).fetchall()
+        return [json.loads(p) for (p,) in payloads]
+
+    def replay(self, supabase_client: Client) -> bool:
+        """
+        Sends every spooled row to Supabase once, oldest first. Returns False if Supabase could not
+        be reached, leaving the remaining rows for the next attempt. Rejected rows are retried on
+        the next pass.
+        """
+        last_id = 0
+        while True:
+            with self._lock:
+                batch = self._db.execute(
+                    "SELECT id, table_name, on_conflict, payload, attempts FROM pending_writes "
+                    "WHERE dead = 0 AND id > ? ORDER BY id LIMIT ?", (last_id, BATCH_SIZE)
+                ).fetchall()
+            if not batch:
+                return True
+            for group in self._group(batch):
+                if not self._send(supabase_client, group):
+                    return False
+            last_id = batch[-1][0]
+
+    @staticmethod
+    def _group(batch: List[Tuple]) -> List[List[Tuple]]:
+        """Splits a batch into runs of consecutive rows that can go in one bulk upsert."""
+        groups: List[List[Tuple]] = []
+        previous_key = None
+        for entry in batch:
+            key = (entry[1], entry[2], tuple(sorted(json.loads(entry[3]))))
+            if key != previous_key:
+                groups.append([])
+                previous_key = key
+            groups[-1].append(entry)
+        return groups
+
+    def _send(self, supabase_client: Client, group: List[Tuple]) -> bool:
+        table, on_conflict = group[0][1], group[0][2]
+        try:
+            self._upsert(supabase_client, table, on_conflict, [json.loads(e[3]) for e in group])
+            self._delete([e[0] for e in group])
+            return True
+        except Exception as e:
+            self._last_error = str(e)
+            if not is_rejection(e):
+                return False
+
+        # Supabase refused the batch because of some row in it: send them one by one to find it.
+        for entry_id, _, _, payload, attempts in group:
+            try:
+                self._upsert(supabase_client, table, on_conflict, [json.loads(payload)])
+                self._delete([entry_id])
+            except Exception as e:
+                self._last_error = str(e)
+                if not is_rejection(e):
+                    return False
+                with self._lock:
+                    self._db.execute(
+                        "UPDATE pending_writes SET attempts = ?, last_error = ?, dead = ? WHERE id = ?",
+                        (attempts + 1, self._last_error, int(attempts + 1 >= MAX_ATTEMPTS), entry_id),
+                    )
+        return True
+
+    @staticmethod
+    def _upsert(supabase_client: Client, table: str, on_conflict: str, rows: List[Dict]) -> None:
+        # The rows are left out so the description is cheap and maps to one query_stats template.
+        query_desc = f"UPSERT INTO {table} ON CONFLICT ({on_conflict}) DO NOTHING"
+        execute_query(query_desc, supabase_client.table(table).upsert(rows, on_conflict=on_conflict, ignore_duplicates=True))
+
+    def _delete(self, ids: List[int]) -> None:
+        if not ids:
+            return
+        with self._lock:
+            self._db.executemany("DELETE FROM pending_writes WHERE id = ?", [(i,) for i in ids])
+        self._replayed += len(ids)
+
+    def start(self, supabase_client: Client) -> None:
+        """Starts the background thread that replays rows as they are enqueued."""
+        if self._worker is not None:
+            return
+
+        def run():
+            delay = RETRY_SECONDS
+            while not self._stop.is_set():
+                self._wake.clear()
+                if self.replay(supabase_client):
+                    delay = RETRY_SECONDS
+                    self._wake.wait()
+                else:
+                    self._failed_attempts += 1
+                    self._stop.wait(delay)
+                    delay = min(delay * 2, MAX_BACKOFF_SECONDS)
+
+        self._stop.clear()
+        self._wake.set()
+        self._worker = threading.Thread(target=run, name="write-behind", daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stops the replay thread after giving it up to `timeout` seconds to drain the spool."""
+        if self._worker is None:
+            return
+        deadline = time.monotonic() + timeout
+        while self.stats()["pending"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._stop.set()
+        self._wake.set()
+        self._worker.join(max(0.0, deadline - time.monotonic()))
+        self._worker = None
+
+    def stats(self) -> Dict:
+        """Returns the spool depth, replay counters and the last Supabase error."""
+        with self._lock:
+            pending, dead, oldest = self._db.execute(
+                "SELECT SUM(dead = 0), SUM(dead = 1), MIN(CASE WHEN dead = 0 THEN enqueued_at END) FROM pending_writes"
+            ).fetchone()
+        return {
+            "pending": pending or 0,
+            "dead": dead or 0,
+            "oldest_pending_seconds": round(time.time() - oldest, 1) if oldest else None,
+            "replayed": self._replayed,
+            "failed_replays": self._failed_attempts,
+            "last_error": self._last_error,
+        }
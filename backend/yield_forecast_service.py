@@ -0,0 +1,205 @@
+"""
+Kerala Yield Forecast Service - Vectorized Trend and Weather Regression
+Fits every (district, crop, season) series in historical_agriculture_data in one NumPy pass and
+serves next-season productivity and production forecasts from memory until the data changes.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from supabase import Client
+
+from reference_data import ReferenceDataWatcher
+from reference_snapshot import SnapshotStore, encode_rows
+
+# Ridge penalty on the slope terms; keeps short or flat series from producing wild trends.
+RIDGE_PENALTY = 1e-3
+# Weather impact factor assumed for the forecast season (1.0 is a normal season).
+NEUTRAL_WEATHER_FACTOR = 1.0
+# z-score for the reported 80% prediction interval.
+INTERVAL_Z = 1.2816
+PAGE_SIZE = 1000
+HISTORICAL_TABLE = "historical_agriculture_data"
+
+SeriesKey = Tuple[str, str, str]
+
+
+def fit_series(years: np.ndarray, values: np.ndarray, weather: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fits y = b0 + b1 * (year - mean) [+ b2 * (weather - 1)] to every row of `values` at once.
+
+    `values` and `weather` are (series, years) arrays with NaN for missing observations.
+    Returns the (series, terms) coefficients and the residual standard deviation per series.
+    """
+    mask = ~np.isnan(values)
+    if weather is not None:
+        mask &= ~np.isnan(weather)
+    centered_years = years - years.mean()
+
+    columns = [np.ones_like(values), np.broadcast_to(centered_years, values.shape)]
+    if weather is not None:
+        columns.append(np.nan_to_num(weather - NEUTRAL_WEATHER_FACTOR))
+    design = np.stack(columns, axis=-1) * mask[..., None]
+    target = np.where(mask, values, 0.0)
+
+    terms = design.shape[-1]
+    penalty = np.eye(terms) * RIDGE_PENALTY
+    penalty[0, 0] = 0.0
+    gram = np.einsum("stk,stl->skl", design, design) + penalty
+    # Series with no observations would leave the intercept unconstrained.
+    gram[:, 0, 0] = np.maximum(gram[:, 0, 0], 1.0)
+    moment = np.einsum("stk,st->sk", design, target)
+    coefficients = np.linalg.solve(gram, moment[..., None])[..., 0]
+
+    residuals = (target - np.einsum("stk,sk->st", design, coefficients)) * mask
+    observations = mask.sum(axis=1)
+    dof = np.maximum(observations - terms, 1)
+    residual_std = np.sqrt((residuals ** 2).sum(axis=1) / dof)
+    return coefficients, residual_std
+
+
+class YieldForecastService:
+    def __init__(
+        self,
+        supabase_client: Client,
+        watcher: Optional[ReferenceDataWatcher] = None,
+        snapshots: Optional[SnapshotStore] = None,
+    ):
+        """
+        Initialize the forecast service; the model is fitted on the first refresh.
+        With `snapshots`, the historical rows are read from the current reference snapshot while it is up to date.
+        """
+        self.supabase = supabase_client
+        self.snapshots = snapshots
+        self.watcher = watcher or ReferenceDataWatcher(supabase_client, snapshots=snapshots)
+        self._forecasts: Dict[SeriesKey, Dict] = {}
+        self.forecast_year: Optional[int] = None
+        self.fit_ms: Optional[float] = None
+        self._fitted = False
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Reloads the historical rows and refits every series."""
+        versions = self.watcher.begin_build()
+        records, strings = self._load_records(versions)
+        started = time.perf_counter()
+        forecasts, forecast_year = self.fit(records, strings)
+        fit_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._forecasts = forecasts
+            self.forecast_year = forecast_year
+            self.fit_ms = fit_ms
+            self._fitted = True
+        self.watcher.mark_built(versions)
+        print(f"Yield forecast: fitted {len(forecasts)} series in {fit_ms:.1f} ms ({self.watcher.version_tag}).")
+
+    def forecast(self, crop: Optional[str] = None, district: Optional[str] = None, season: Optional[str] = None) -> List[Dict]:
+        """Returns the cached forecasts matching the given filters (case-insensitive)."""
+        if not self._fitted or self.watcher.has_changed():
+            self.refresh()
+
+        wanted = (district, crop, season)
+        if all(wanted):
+            match = self._forecasts.get(tuple(v.lower() for v in wanted))
+            return [match] if match else []
+        return [
+            f for key, f in self._forecasts.items()
+            if all(w is None or w.lower() == k for w, k in zip(wanted, key))
+        ]
+
+    def _load_records(self, versions: Optional[Dict[str, int]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the historical records and their strings, in the reference snapshot layout."""
+        mapped = self.snapshots.table(HISTORICAL_TABLE, versions) if self.snapshots else None
+        if mapped is not None:
+            return mapped
+
+        rows: List[Dict] = []
+        start = 0
+        while True:
+            response = self.supabase.table(HISTORICAL_TABLE).select(
+                "district_name, crop_name, season, year, area_hectares, "
+                "productivity_tonnes_per_hectare, weather_impact_factor"
+            ).order("historical_data_id").range(start, start + PAGE_SIZE - 1).execute()
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return encode_rows(HISTORICAL_TABLE, rows)
+            start += PAGE_SIZE
+
+    @staticmethod
+    def fit(records: np.ndarray, strings: np.ndarray) -> Tuple[Dict[SeriesKey, Dict], Optional[int]]:
+        """
+        Fits all series in `records` (historical rows in the reference snapshot layout, with text
+        columns indexing `strings`) and returns the forecasts keyed by lower-cased (district, crop, season).
+        """
+        if len(records) == 0:
+            return {}, None
+
+        # Number each (district, crop, season) combination of string codes; NULL codes are -1.
+        code_space = len(strings) + 1
+        combined = (
+            (records["district_name"].astype(np.int64) + 1) * code_space + records["crop_name"] + 1
+        ) * code_space + records["season"] + 1
+        unique_codes, row_codes = np.unique(combined, return_inverse=True)
+
+        def decode(codes: np.ndarray) -> List[str]:
+            return ["" if c < 0 else str(strings[c]) for c in codes.tolist()]
+
+        labels = list(zip(
+            decode(unique_codes // code_space ** 2 - 1),
+            decode(unique_codes // code_space % code_space - 1),
+            decode(unique_codes % code_space - 1),
+        ))
+        # Series are numbered in label order, so forecasts come back sorted.
+        order = sorted(range(len(labels)), key=labels.__getitem__)
+        unique_labels = [labels[i] for i in order]
+        rank = np.empty(len(order), dtype=np.intp)
+        rank[order] = np.arange(len(order))
+        row_series = rank[row_codes.reshape(-1)]
+
+        year_of_row = records["year"].astype(np.int64)
+        first_year, last_year = int(year_of_row.min()), int(year_of_row.max())
+        years = np.arange(first_year, last_year + 1, dtype=float)
+        row_year = year_of_row - first_year
+
+        def grid(column: str) -> np.ndarray:
+            values = np.full((len(unique_labels), len(years)), np.nan)
+            values[row_series, row_year] = records[column]
+            return values
+
+        productivity = grid("productivity_tonnes_per_hectare")
+        area = grid("area_hectares")
+        weather = grid("weather_impact_factor")
+
+        productivity_coef, productivity_std = fit_series(years, productivity, weather)
+        area_coef, _ = fit_series(years, area)
+
+        next_offset = (last_year + 1) - years.mean()
+        predicted_productivity = np.maximum(productivity_coef[:, 0] + productivity_coef[:, 1] * next_offset, 0.0)
+        predicted_area = np.maximum(area_coef[:, 0] + area_coef[:, 1] * next_offset, 0.0)
+        predicted_production = predicted_productivity * predicted_area
+        interval = INTERVAL_Z * productivity_std
+        observations = (~np.isnan(productivity)).sum(axis=1)
+
+        forecasts = {}
+        for i, (district, crop, season) in enumerate(unique_labels):
+            forecasts[(district.lower(), crop.lower(), season.lower())] = {
+                "district": district,
+                "crop": crop,
+                "season": season or None,
+                "forecast_year": last_year + 1,
+                "years_used": int(observations[i]),
+                "productivity_tonnes_per_hectare": round(float(predicted_productivity[i]), 3),
+                "productivity_interval_80": [
+                    round(float(max(predicted_productivity[i] - interval[i], 0.0)), 3),
+                    round(float(predicted_productivity[i] + interval[i]), 3),
+                ],
+                "area_hectares": round(float(predicted_area[i]), 2),
+                "production_tonnes": round(float(predicted_production[i]), 2),
+                "trend_per_year": round(float(productivity_coef[i, 1]), 4),
+                # Change in productivity per 0.1 change in the weather impact factor.
+                "weather_sensitivity": round(float(productivity_coef[i, 2]) * 0.1, 4),
+            }
+        return forecasts, last_year + 1
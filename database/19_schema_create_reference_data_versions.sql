@@ -0,0 +1,43 @@
+-- SCRIPT 19: CREATE REFERENCE DATA VERSIONS
+-- Tracks a version counter for each reference table so the API can cache documents
+-- built from them and rebuild only when the underlying data actually changes.
+
+CREATE TABLE IF NOT EXISTS reference_data_versions (
+    table_name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+INSERT INTO reference_data_versions (table_name) VALUES
+    ('districts'),
+    ('comprehensive_agriculture_data'),
+    ('historical_agriculture_data')
+ON CONFLICT (table_name) DO NOTHING;
+
+-- Bump the version once per statement, so a bulk load counts as a single change.
+CREATE OR REPLACE FUNCTION bump_reference_data_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE reference_data_versions
+    SET version = version + 1, updated_at = NOW()
+    WHERE table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS trg_districts_version ON districts;
+CREATE TRIGGER trg_districts_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON districts
+FOR EACH STATEMENT EXECUTE FUNCTION bump_reference_data_version();
+
+DROP TRIGGER IF EXISTS trg_comprehensive_data_version ON comprehensive_agriculture_data;
+CREATE TRIGGER trg_comprehensive_data_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON comprehensive_agriculture_data
+FOR EACH STATEMENT EXECUTE FUNCTION bump_reference_data_version();
+
+DROP TRIGGER IF EXISTS trg_historical_data_version ON historical_agriculture_data;
+CREATE TRIGGER trg_historical_data_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON historical_agriculture_data
+FOR EACH STATEMENT EXECUTE FUNCTION bump_reference_data_version();
+
+GRANT SELECT ON reference_data_versions TO anon, authenticated;
@@ -0,0 +1,134 @@
+-- SCRIPT 20: ADD CHANGE TRACKING FOR DELTA SYNC
+-- Adds updated_at columns and a tombstone table so the /sync endpoint can return only the
+-- farms, plots, plantings, activities and chat messages that changed since a client's cursor.
+
+-- 1. updated_at columns, backfilled from created_at where the table has one.
+ALTER TABLE farms ADD COLUMN updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW();
+ALTER TABLE farm_plots ADD COLUMN updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW();
+ALTER TABLE plantings ADD COLUMN updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW();
+ALTER TABLE activities_log ADD COLUMN updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW();
+ALTER TABLE chat_messages ADD COLUMN updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW();
+
+UPDATE farms SET updated_at = created_at WHERE created_at IS NOT NULL;
+UPDATE activities_log SET updated_at = created_at WHERE created_at IS NOT NULL;
+UPDATE chat_messages SET updated_at = created_at WHERE created_at IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_farms_updated_at BEFORE UPDATE ON farms
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE TRIGGER trg_farm_plots_updated_at BEFORE UPDATE ON farm_plots
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE TRIGGER trg_plantings_updated_at BEFORE UPDATE ON plantings
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE TRIGGER trg_activities_log_updated_at BEFORE UPDATE ON activities_log
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE TRIGGER trg_chat_messages_updated_at BEFORE UPDATE ON chat_messages
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+-- 2. Indexes so each delta query is a range scan over the user's recently changed rows.
+CREATE INDEX idx_farms_owner_updated_at ON farms(owner_id, updated_at);
+CREATE INDEX idx_farm_plots_farm_updated_at ON farm_plots(farm_id, updated_at);
+CREATE INDEX idx_plantings_plot_updated_at ON plantings(plot_id, updated_at);
+CREATE INDEX idx_activities_log_planting_updated_at ON activities_log(planting_id, updated_at);
+CREATE INDEX idx_chat_messages_user_updated_at ON chat_messages(user_id, updated_at);
+
+-- 3. Tombstones for deleted rows.
+-- A child row deleted by a cascade from its farm cannot be traced back to an owner, so no
+-- tombstone is written for it; the client drops children together with a deleted parent.
+CREATE TABLE sync_tombstones (
+    tombstone_id BIGSERIAL PRIMARY KEY,
+    owner_id UUID NOT NULL,
+    entity TEXT NOT NULL CHECK (entity IN ('farms', 'plots', 'plantings', 'activities', 'chat_messages')),
+    entity_id BIGINT NOT NULL,
+    deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX idx_sync_tombstones_owner_deleted_at ON sync_tombstones(owner_id, deleted_at);
+
+CREATE OR REPLACE FUNCTION record_sync_tombstone()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_owner_id UUID;
+    v_entity TEXT;
+    v_entity_id BIGINT;
+BEGIN
+    IF TG_TABLE_NAME = 'farms' THEN
+        v_entity := 'farms';
+        v_entity_id := OLD.farm_id;
+        v_owner_id := OLD.owner_id;
+    ELSIF TG_TABLE_NAME = 'farm_plots' THEN
+        v_entity := 'plots';
+        v_entity_id := OLD.plot_id;
+        SELECT f.owner_id INTO v_owner_id FROM farms f WHERE f.farm_id = OLD.farm_id;
+    ELSIF TG_TABLE_NAME = 'plantings' THEN
+        v_entity := 'plantings';
+        v_entity_id := OLD.planting_id;
+        SELECT f.owner_id INTO v_owner_id
+        FROM farm_plots fp JOIN farms f ON fp.farm_id = f.farm_id
+        WHERE fp.plot_id = OLD.plot_id;
+    ELSIF TG_TABLE_NAME = 'activities_log' THEN
+        v_entity := 'activities';
+        v_entity_id := OLD.activity_id;
+        SELECT f.owner_id INTO v_owner_id
+        FROM plantings p
+        JOIN farm_plots fp ON p.plot_id = fp.plot_id
+        JOIN farms f ON fp.farm_id = f.farm_id
+        WHERE p.planting_id = OLD.planting_id;
+    ELSIF TG_TABLE_NAME = 'chat_messages' THEN
+        v_entity := 'chat_messages';
+        v_entity_id := OLD.message_id;
+        v_owner_id := OLD.user_id;
+    END IF;
+
+    IF v_owner_id IS NOT NULL THEN
+        INSERT INTO sync_tombstones (owner_id, entity, entity_id) VALUES (v_owner_id, v_entity, v_entity_id);
+    END IF;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE TRIGGER trg_farms_tombstone AFTER DELETE ON farms
+FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone();
+CREATE TRIGGER trg_farm_plots_tombstone AFTER DELETE ON farm_plots
+FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone();
+CREATE TRIGGER trg_plantings_tombstone AFTER DELETE ON plantings
+FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone();
+CREATE TRIGGER trg_activities_log_tombstone AFTER DELETE ON activities_log
+FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone();
+CREATE TRIGGER trg_chat_messages_tombstone AFTER DELETE ON chat_messages
+FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone();
+
+GRANT SELECT ON sync_tombstones TO authenticated;
+
+-- 4. Expose updated_at through the user_activities view (new columns go at the end).
+CREATE OR REPLACE VIEW user_activities AS
+SELECT
+    al.activity_id,
+    al.planting_id,
+    al.activity_type,
+    al.notes,
+    al.cost,
+    al.status,
+    al.scheduled_for,
+    al.completed_at,
+    al.created_at,
+    f.owner_id,
+    p.crop_id,
+    fp.farm_id,
+    fp.plot_id,
+    al.updated_at
+FROM
+    activities_log al
+JOIN
+    plantings p ON al.planting_id = p.planting_id
+JOIN
+    farm_plots fp ON p.plot_id = fp.plot_id
+JOIN
+    farms f ON fp.farm_id = f.farm_id;
@@ -0,0 +1,29 @@
+-- SCRIPT 21: CREATE QUERY STATS TABLE
+-- Replaces the one-row-per-call query_log with a compact summary: each API worker writes one
+-- row per query template per flush window, with literals replaced by '?' placeholders.
+
+CREATE TABLE IF NOT EXISTS public.query_stats (
+    stat_id BIGSERIAL PRIMARY KEY,
+    template_id TEXT NOT NULL,
+    template TEXT NOT NULL,
+    window_start TIMESTAMPTZ NOT NULL,
+    window_end TIMESTAMPTZ NOT NULL,
+    calls INT NOT NULL,
+    errors INT NOT NULL DEFAULT 0,
+    total_ms REAL,
+    p50_ms REAL,
+    p95_ms REAL,
+    max_ms REAL
+);
+
+CREATE INDEX idx_query_stats_template_window ON public.query_stats(template_id, window_start);
+CREATE INDEX idx_query_stats_window_start ON public.query_stats(window_start);
+
+-- The API only appends statistics; reading them back needs the service role.
+REVOKE ALL ON TABLE public.query_stats FROM anon, authenticated;
+GRANT INSERT ON TABLE public.query_stats TO anon, authenticated;
+GRANT USAGE ON SEQUENCE public.query_stats_stat_id_seq TO anon, authenticated;
+GRANT ALL ON TABLE public.query_stats TO service_role;
+GRANT USAGE, SELECT ON SEQUENCE public.query_stats_stat_id_seq TO service_role;
+
+COMMENT ON TABLE public.query_stats IS 'Per-template API query statistics (count, errors, p50/p95/max duration) per flush window.';
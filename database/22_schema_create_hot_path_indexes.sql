@@ -0,0 +1,37 @@
+-- SCRIPT 22: CREATE HOT-PATH AND TRIGRAM INDEXES
+-- Supports the lookups the API runs on every request, plus the ILIKE '%x%' filters on the
+-- reference tables, which a plain B-tree cannot serve. Checked by database/check_query_plans.py.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Chat history: WHERE user_id = ? ORDER BY created_at. Supersedes the user_id-only index.
+CREATE INDEX IF NOT EXISTS idx_chat_messages_user_created_at ON chat_messages(user_id, created_at);
+DROP INDEX IF EXISTS idx_chat_messages_user_id;
+
+-- Due/overdue tasks: WHERE status = ? AND scheduled_for < ?. Supersedes the status-only index.
+CREATE INDEX IF NOT EXISTS idx_activities_log_status_scheduled_for ON activities_log(status, scheduled_for);
+DROP INDEX IF EXISTS idx_activities_log_status;
+
+-- Log retention and time-range reads.
+CREATE INDEX IF NOT EXISTS idx_query_log_executed_at ON query_log(executed_at);
+
+-- Substring filters used by agriculture_data_service and the calendar/context functions.
+CREATE INDEX IF NOT EXISTS idx_comprehensive_data_district_trgm
+    ON comprehensive_agriculture_data USING gin (district_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_comprehensive_data_crop_trgm
+    ON comprehensive_agriculture_data USING gin (crop_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_comprehensive_data_season_trgm
+    ON comprehensive_agriculture_data USING gin (season gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_comprehensive_data_planting_period_trgm
+    ON comprehensive_agriculture_data USING gin (planting_period gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_historical_data_crop_trgm
+    ON historical_agriculture_data USING gin (crop_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_historical_data_district_trgm
+    ON historical_agriculture_data USING gin (district_name gin_trgm_ops);
+
+ANALYZE chat_messages;
+ANALYZE activities_log;
+ANALYZE query_log;
+ANALYZE comprehensive_agriculture_data;
+ANALYZE historical_agriculture_data;
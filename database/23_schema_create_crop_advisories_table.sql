@@ -0,0 +1,33 @@
+-- SCRIPT 23: CREATE CROP ADVISORIES TABLE
+-- Stores advisories generated offline by backend/generate_advisories.py for every
+-- (district, major crop, month), so common "what should I do this month" questions are answered
+-- without a live model call.
+
+CREATE TABLE IF NOT EXISTS crop_advisories (
+    advisory_id BIGSERIAL PRIMARY KEY,
+    district_name TEXT NOT NULL,
+    crop_name TEXT NOT NULL,
+    month INT NOT NULL CHECK (month BETWEEN 1 AND 12),
+    advisory TEXT NOT NULL,
+    model TEXT NOT NULL,
+    generated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE (district_name, crop_name, month)
+);
+
+CREATE INDEX IF NOT EXISTS idx_crop_advisories_district_month ON crop_advisories(district_name, month);
+
+-- Chat and the calendar serve advisory text as-is, so only generate_advisories.py, running with
+-- the service role key, may write it; the anon key ships in the frontend bundle.
+REVOKE ALL ON crop_advisories FROM anon, authenticated;
+GRANT SELECT ON crop_advisories TO anon, authenticated;
+GRANT ALL ON crop_advisories TO service_role;
+GRANT USAGE, SELECT ON SEQUENCE crop_advisories_advisory_id_seq TO service_role;
+
+-- Rebuild the API's cached calendar and advisory lookups when advisories change (see script 19).
+INSERT INTO reference_data_versions (table_name) VALUES ('crop_advisories')
+ON CONFLICT (table_name) DO NOTHING;
+
+DROP TRIGGER IF EXISTS trg_crop_advisories_version ON crop_advisories;
+CREATE TRIGGER trg_crop_advisories_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON crop_advisories
+FOR EACH STATEMENT EXECUTE FUNCTION bump_reference_data_version();
@@ -0,0 +1,8 @@
+-- SCRIPT 24: ADD CLIENT MESSAGE ID TO CHAT MESSAGES
+-- The API writes chat messages through a local write-behind spool (backend/write_behind.py) and
+-- may replay a row whose first insert succeeded just before a crash. Each message carries an ID
+-- generated by the API so replays are upserted onto the existing row instead of duplicating it.
+
+ALTER TABLE chat_messages ADD COLUMN IF NOT EXISTS client_message_id UUID;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_chat_messages_client_message_id ON chat_messages(client_message_id);
@@ -0,0 +1,8 @@
+-- SCRIPT 25: WIDEN HISTORICAL DATA NUMERIC COLUMNS
+-- Production in the historical CSV reaches about 1.06 billion (coconut, counted in nuts), which
+-- overflows DECIMAL(10, 2), so the historical data could not be loaded. Productivity is given
+-- to three decimals in the CSV and was rounded to two.
+
+ALTER TABLE historical_agriculture_data
+    ALTER COLUMN production_tonnes TYPE DECIMAL(14, 2),
+    ALTER COLUMN productivity_tonnes_per_hectare TYPE DECIMAL(10, 3);
@@ -0,0 +1,7 @@
+-- SCRIPT 26: ADD CROP STAGE TO CROP ADVISORIES
+-- Chat answers "what should I plant this month" from the stored advisories, which cover every major
+-- crop in every month. The stage (Planting, Harvest or Crop care) lets it list only the crops
+-- planted that month. Advisories stored before this script have no stage; running
+-- backend/generate_advisories.py again regenerates them with one.
+
+ALTER TABLE crop_advisories ADD COLUMN IF NOT EXISTS stage TEXT;
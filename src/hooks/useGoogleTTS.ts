@@ -8,6 +8,34 @@ interface GoogleTTSHook {
   browserSupportsAudio: boolean;
 }
 
+const AUDIO_MIME_TYPE = 'audio/mpeg';
+
+// MediaSource lets playback start with the first chunk; without it the whole stream is buffered first.
+const supportsStreamingPlayback = (): boolean =>
+  typeof window !== 'undefined' && 'MediaSource' in window && MediaSource.isTypeSupported(AUDIO_MIME_TYPE);
+
+// Appends the MP3 stream to the MediaSource chunk by chunk as it arrives from the server.
+const appendStream = async (mediaSource: MediaSource, stream: ReadableStream<Uint8Array>): Promise<void> => {
+  if (mediaSource.readyState !== 'open') {
+    await new Promise<void>((resolve) => mediaSource.addEventListener('sourceopen', () => resolve(), { once: true }));
+  }
+  const sourceBuffer = mediaSource.addSourceBuffer(AUDIO_MIME_TYPE);
+  // Each server chunk is a separate MP3 whose timestamps restart at zero, so play them back to back.
+  sourceBuffer.mode = 'sequence';
+
+  const reader = stream.getReader();
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    await new Promise<void>((resolve, reject) => {
+      sourceBuffer.addEventListener('updateend', () => resolve(), { once: true });
+      sourceBuffer.addEventListener('error', () => reject(new Error('Audio buffering failed')), { once: true });
+      sourceBuffer.appendBuffer(value);
+    });
+  }
+  mediaSource.endOfStream();
+};
+
 export const useGoogleTTS = (): GoogleTTSHook => {
   const browserSupportsAudio = typeof window !== 'undefined' && 'Audio' in window;
   const [isSpeaking, setIsSpeaking] = useState(false);
@@ -55,54 +83,82 @@ export const useGoogleTTS = (): GoogleTTSHook => {
       .replace(/\n/g, ' ')             // Replace single newlines with space
       .trim();
 
+    // Allow stop during request and streaming (only in browser)
+    let abortController: AbortController | null = null;
     try {
       console.log(`🔊 Google TTS: Synthesizing "${cleanText.substring(0, 50)}..." in ${language}`);
       
-      // Allow stop during request (only in browser)
       if (typeof window !== 'undefined' && 'AbortController' in window) {
-        abortControllerRef.current = new AbortController();
+        abortController = new AbortController();
+        abortControllerRef.current = abortController;
+      }
+
+      const audioStream = await apiClient.textToSpeech(cleanText, language, abortController?.signal);
+
+      // Stream into a MediaSource so playback starts with the first synthesized chunk.
+      let audioUrl: string;
+      let buffering: Promise<void>;
+      if (supportsStreamingPlayback()) {
+        const mediaSource = new MediaSource();
+        audioUrl = URL.createObjectURL(mediaSource);
+        buffering = appendStream(mediaSource, audioStream);
+      } else {
+        const audioBlob = await new Response(audioStream).blob();
+        audioUrl = URL.createObjectURL(new Blob([audioBlob], { type: AUDIO_MIME_TYPE }));
+        buffering = Promise.resolve();
       }
 
-      const data = await apiClient.textToSpeech(cleanText, language);
-      
-      // Convert base64 to blob and play
-      const audioBytes = Uint8Array.from(atob(data.audio), c => c.charCodeAt(0));
-      const audioBlob = new Blob([audioBytes], { type: data.contentType });
-      const audioUrl = URL.createObjectURL(audioBlob);
-      
       const audio = new Audio(audioUrl);
       currentAudioRef.current = audio;
       setIsSpeaking(true);
-      
+
+      const finish = () => {
+        URL.revokeObjectURL(audioUrl);
+        if (currentAudioRef.current === audio) currentAudioRef.current = null;
+        setIsSpeaking(false);
+        if (abortControllerRef.current === abortController) abortControllerRef.current = null;
+      };
+
       // Play the audio
       return new Promise((resolve, reject) => {
         audio.addEventListener('ended', () => {
-          URL.revokeObjectURL(audioUrl);
-          currentAudioRef.current = null;
-          setIsSpeaking(false);
-          abortControllerRef.current = null;
+          finish();
           console.log('🔊 Google TTS: Playback completed');
           resolve();
         });
         
         audio.addEventListener('error', (e) => {
-          URL.revokeObjectURL(audioUrl);
-          currentAudioRef.current = null;
-          setIsSpeaking(false);
-          abortControllerRef.current = null;
+          finish();
           console.error('🔊 Google TTS: Playback error:', e);
           reject(new Error('Audio playback failed'));
         });
+
+        buffering.catch((error) => {
+          // Stopping aborts the download; that is not a playback failure.
+          if (abortController?.signal.aborted) {
+            finish();
+            resolve();
+            return;
+          }
+          audio.pause();
+          finish();
+          console.error('🔊 Google TTS: Streaming error:', error);
+          reject(error);
+        });
         
         audio.play().catch((error) => {
-          currentAudioRef.current = null;
-          setIsSpeaking(false);
-          abortControllerRef.current = null;
+          finish();
           reject(error);
         });
       });
 
     } catch (error) {
+      // Stop pressed before the audio arrived aborts the request; don't read the text aloud anyway.
+      if (abortController?.signal.aborted || (error instanceof Error && error.name === 'AbortError')) {
+        setIsSpeaking(false);
+        return;
+      }
+
       console.error('🔊 Google TTS Error:', error);
       
       // Fallback to browser TTS if Google TTS fails
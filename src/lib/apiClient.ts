@@ -77,6 +77,17 @@ export interface ActivityCreate {
   scheduled_for: string; // ISO datetime string
 }
 
+export interface SyncResponse {
+  cursor: string;
+  full: boolean;
+  farms: any[];
+  plots: any[];
+  plantings: any[];
+  activities: Activity[];
+  chat_messages: ChatMessageFromDB[];
+  deleted: Record<'farms' | 'plots' | 'plantings' | 'activities' | 'chat_messages', number[]>;
+}
+
 export interface ChatMessageFromDB {
     sender: 'user' | 'bot';
     content: string;
@@ -119,8 +130,16 @@ export const apiClient = {
   getActivitiesForPlanting: (plantingId: number): Promise<Activity[]> => fetchWithAuth(`/plantings/${plantingId}/activities`).then(handleResponse),
 
 
+  // Delta Sync
+  sync: (since?: string): Promise<SyncResponse> =>
+    fetchWithAuth(since ? `/sync?since=${encodeURIComponent(since)}` : "/sync").then(handleResponse),
+
   // Calendar
-  getCropCalendar: (month: number): Promise<any> => fetchWithAuth(`/crop-calendar?month=${month}`).then(handleResponse),
+  getCropCalendar: (month: number, district?: string): Promise<any> => {
+    const params = new URLSearchParams({ month: month.toString() });
+    if (district) params.set("district", district);
+    return fetchWithAuth(`/crop-calendar?${params.toString()}`).then(handleResponse);
+  },
 
   // Weather
   getWeather: (lat?: number, lon?: number, language?: string): Promise<any> => {
@@ -133,12 +152,25 @@ export const apiClient = {
     return fetchWithAuth(url).then(handleResponse);
   },
 
+  getFarmsWeather: (forecastDays: number = 3): Promise<any> =>
+    fetchWithAuth(`/weather/farms?forecast_days=${forecastDays}`).then(handleResponse),
+
   // Text-to-Speech
-  textToSpeech: (text: string, language: string = 'en'): Promise<any> => 
-    fetchWithAuth("/tts", {
+  // Returns the synthesized speech as an audio/mpeg byte stream. The server sends each
+  // sentence-sized chunk as soon as it is synthesized, so playback can start before the end.
+  textToSpeech: async (text: string, language: string = 'en', signal?: AbortSignal): Promise<ReadableStream<Uint8Array>> => {
+    const response = await fetchWithAuth("/tts", {
       method: "POST",
       body: JSON.stringify({ text, language }),
-    }).then(handleResponse),
+      signal,
+    });
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({ detail: response.statusText }));
+      throw new Error(errorData.detail || `API Error: ${response.statusText}`);
+    }
+    // Browsers without streaming response bodies get the whole audio as a single chunk.
+    return response.body ?? (await response.blob()).stream();
+  },
 
   // Chat
   getChatHistory: (): Promise<ChatMessageFromDB[]> => 